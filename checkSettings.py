@@ -24,6 +24,7 @@ from userSettingsObjects import simulationSettings, valueWithLimits
 from initializeSimulation import simulationStatus
 from warnings import warn
 from math import pow, isnan
+from loadChannelFiles import isTouchstoneFile, checkPortMap
 
 differenceTolerance = 0.00001 # Accepable deviation (absolute) between values to be considered equal (to deal with representation)
 
@@ -84,12 +85,26 @@ def checkGeneralSettings(simSettings: simulationSettings):
     checkLimits(simSettings.general.levelNumb, 'general.levelNumb')
     checkLimits(simSettings.general.samplerNumb, 'general.samplerNumb')
     checkLimits(simSettings.general.numbSymb, 'general.numbSymb')
+    checkLimits(simSettings.general.workerCount, 'general.workerCount')
+    checkLimits(simSettings.general.ISIBlockSize, 'general.ISIBlockSize')
 
     allowedSignalingModes = ['standard', '1+D', '1+0.5D', 'clock']
     if not simSettings.general.signalingMode in allowedSignalingModes:
         print('Allowed signalling modes:')
         print(allowedSignalingModes)
         error('unrecognized signaling mode!')
+
+    allowedPulseEngines = ['time', 'frequency', 'superposition']
+    if not simSettings.general.pulseEngine in allowedPulseEngines:
+        print('Allowed pulse response engines:')
+        print(allowedPulseEngines)
+        error('unrecognized pulse response engine!')
+
+    allowedISIModes = ['enumerate', 'stream', 'convolve']
+    if not simSettings.general.ISIMode in allowedISIModes:
+        print('Allowed ISI generation modes:')
+        print(allowedISIModes)
+        error('unrecognized ISI generation mode!')
     
 
 
@@ -209,9 +224,14 @@ def checkChannelSettings(simSettings: simulationSettings):
     
     # Check channel files for allowed extensions
     for channel in simSettings.channel.fileNames.__dict__:
-        if not ((simSettings.channel.fileNames.__dict__[channel][-4:] == '.s4p') or (simSettings.channel.fileNames.__dict__[channel][-4:] == '.mat')):
+        if not (isTouchstoneFile(simSettings.channel.fileNames.__dict__[channel]) or (simSettings.channel.fileNames.__dict__[channel][-4:] == '.mat')):
             print('Invalid file extension for channel file with filename of "{0}"'.format(simSettings.channel.fileNames.__dict__[channel]))
-            error('unknown channel file type detected, please ensure using .mat or .s4p files!')
+            error('unknown channel file type detected, please ensure using .mat or Touchstone (.s4p, .s8p...) files!')
+    
+    # Check Touchstone port map (number of ports is only known once files are read)
+    if not checkPortMap(simSettings.channel.portMap, float('inf')):
+        print('Port map: {0}'.format(simSettings.channel.portMap))
+        error('channel port map must list at least two [positive, negative] port pairs without repeating a port!')
         
     
     if simSettings.channel.fileNames.thru == False:
@@ -223,6 +243,23 @@ def checkChannelSettings(simSettings: simulationSettings):
     
     
     checkLimits(simSettings.channel.noise.noiseDensity, 'channel.noise.noiseDensity')
+    checkLimits(simSettings.channel.decimationSpan, 'channel.decimationSpan')
+    checkLimits(simSettings.channel.decimationBandLimit, 'channel.decimationBandLimit')
+    checkLimits(simSettings.channel.truncationEnergy, 'channel.truncationEnergy')
+    checkLimits(simSettings.channel.truncationSpan, 'channel.truncationSpan')
+    checkLimits(simSettings.channel.rationalPoleCount, 'channel.rationalPoleCount')
+    checkLimits(simSettings.channel.rationalSpan, 'channel.rationalSpan')
+    checkLimits(simSettings.channel.rationalTolerance, 'channel.rationalTolerance')
+
+    allowedTruncationModes = ['none', 'energy', 'span']
+    if not simSettings.channel.truncationMode in allowedTruncationModes:
+        print('Allowed truncation modes:')
+        print(allowedTruncationModes)
+        error('unrecognized impulse response truncation mode!')
+
+    cursorCount = simSettings.transmitter.preCursorCount.value + simSettings.transmitter.postCursorCount.value + 1
+    if simSettings.channel.decimate and simSettings.channel.decimationSpan.value < 2*cursorCount:
+        warn('channel decimation span is short compared to the pulse response length, accuracy may suffer!')
 
 
 ###########################################################################
@@ -318,6 +355,7 @@ def checkSimTime(simSettings: simulationSettings):
     
     # Import variables
     signalingMode    = simSettings.general.signalingMode
+    ISIMode          = simSettings.general.ISIMode
     samplesPerSymb   = simSettings.general.samplesPerSymb.value
     yAxisLength      = simSettings.general.yAxisLength.value
     channels         = simSettings.channel
@@ -333,7 +371,7 @@ def checkSimTime(simSettings: simulationSettings):
         if xTalkApprox:
             chanNumb = 2
         else:
-            chanNumb = len(channels.fileNames)
+            chanNumb = len(channels.fileNames.__dict__)
     else:
         chanNumb = 1
     
@@ -341,6 +379,8 @@ def checkSimTime(simSettings: simulationSettings):
     # Determine number of calculations
     if signalingMode == 'clock':
         calculations = 2*modulation.value
+    elif ISIMode == 'convolve':
+        calculations = pow(modulation.value, 3) + modulation.value*cursorCount.value
     else:
         calculations = pow(modulation.value, cursorCount.value)
     
@@ -35,9 +35,15 @@ def displayISI(simSettings: simulationSettings, simResults: simulationStatus):
     
     # Plot only if desired
     if not simSettings.general.plotting.ISI: return 
+
+    # Trajectories are only available if every combination was enumerated
+    if simSettings.general.ISIMode != 'enumerate' and simSettings.general.signalingMode != 'clock':
+        print('ISI trajectories are not plotted since they were not kept when generating ISI.')
+        return
     
     # Import variables
     signalingMode  = simSettings.general.signalingMode
+    modulation     = simSettings.general.modulation.value
     samplesPerSymb = simSettings.general.samplesPerSymb.value
     samplePeriod   = simSettings.general.samplePeriod.value
     numbSymb       = simSettings.general.numbSymb.value
@@ -45,18 +51,22 @@ def displayISI(simSettings: simulationSettings, simResults: simulationStatus):
     outputPeak = max(simResults.pulseResponse.receiver.outputs.thru)
     ISI        = simResults.eyeGeneration.ISI.thru
 
-    trajectories = nothing()
-
     # To reduce the discontinuation visibility, ungroup trajectories from their main cursor
-    for mainCursor in ISI.__dict__:
-        for combName in ISI.__dict__[mainCursor].__dict__:
-            setattr(trajectories, combName, ISI.__dict__[mainCursor].__dict__[combName].__dict__['trajectory'])
+    # Mirrored transitions are those they mirror with every level negated
+    symbols = []
+    trajectories = []
+    for transName in ISI.__dict__:
+        if 'mirror' in ISI.__dict__[transName].__dict__:
+            symbols.append(modulation-1-ISI.__dict__[ISI.__dict__[transName].mirror].symbols)
+            trajectories.append(-ISI.__dict__[ISI.__dict__[transName].mirror].trajectories)
+        else:
+            symbols.append(ISI.__dict__[transName].symbols)
+            trajectories.append(ISI.__dict__[transName].trajectories)
+    symbols = np.concatenate(symbols)
+    trajectories = np.concatenate(trajectories)
     
-    # Order trajectories
-    orderTraj = nothing()
-    ordered = sorted(trajectories.__dict__)
-    for comb in ordered:
-        orderTraj.__dict__[comb] = trajectories.__dict__[comb]
+    # Order trajectories by their symbols
+    ordered = np.lexsort(np.flip(symbols, axis=1).T)
     
 
     # Plot all trajectories
@@ -79,7 +89,7 @@ def displayISI(simSettings: simulationSettings, simResults: simulationStatus):
     for comb in ordered:
 
         # Add additional point to stich eyes together
-        trajectory = orderTraj.__dict__[comb]
+        trajectory = trajectories[comb]
 
         trajectory1 = trajectory[int(samplesPerSymb/2):]
         velocity = trajectory1[-1]-trajectory1[-2]
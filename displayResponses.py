@@ -25,6 +25,7 @@
 
 from userSettingsObjects import simulationSettings
 from initializeSimulation import simulationStatus
+from generateVariableInfluence import CTLENames
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy.signal as spsig
@@ -81,10 +82,7 @@ def displayCTLEResponse(simSettings: simulationSettings, simResults: simulationS
     if not simSettings.general.plotting.CTLEResponse: return 
 
     # Import variables
-    zeroFreq   = simSettings.receiver.CTLE.zeroFreq.value
-    pole1Freq  = simSettings.receiver.CTLE.pole1Freq.value
-    zeroName     = ('z' + str(zeroFreq/1e9)).replace('.', '_')
-    poleName     = ('z' + str(pole1Freq/1e9)).replace('.', '_')
+    zeroName, poleName = CTLENames(simSettings)
     CTLE    = simResults.influenceSources.RXCTLE.__dict__[zeroName].__dict__[poleName]
     channel = simResults.influenceSources.channel.thru
     
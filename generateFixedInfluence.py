@@ -24,13 +24,17 @@
 
 import numpy as np
 import scipy.stats as stats
+import scipy.fft as fft
+import scipy.signal as signal
 from userSettingsObjects import simulationSettings
 from initializeSimulation import simulationStatus
 from loadMatlabFiles import objectFromMat
 import control.matlab as ml
 from math import isnan
-import os
-import skrf as rf # Used to read Touchstone files and nothing else
+from fractions import Fraction
+from loadChannelFiles import loadTouchstoneChannels, isTouchstoneFile
+from vectorFitting import fitChannelModel, filterWithModel
+from tabulateCTLE import CTLELattice, loadCTLETable
 
 class combinedChannel:
 
@@ -45,6 +49,9 @@ def generateFixedInfluence(simSettings: simulationSettings, simResults: simulati
 
     # Load channel data
     createChannel(simSettings, simResults)
+
+    # Tabulate CTLE responses
+    createCTLETable(simSettings, simResults)
         
     # Generate TX jitter
     generateTXJitter(simSettings, simResults)
@@ -68,8 +75,10 @@ def generateFixedInfluence(simSettings: simulationSettings, simResults: simulati
 def createChannel(simSettings: simulationSettings, simResults: simulationStatus):
 
     # Import variables
+    symbolRate       = simSettings.general.symbolRate.value
     samplePeriod     = simSettings.general.samplePeriod.value
     samplesPerSymb   = simSettings.general.samplesPerSymb.value
+    workerCount      = int(simSettings.general.workerCount.value)
     tRise            = simSettings.transmitter.tRise.value
     preCursorCount   = simSettings.transmitter.preCursorCount.value
     postCursorCount  = simSettings.transmitter.postCursorCount.value
@@ -83,6 +92,18 @@ def createChannel(simSettings: simulationSettings, simResults: simulationStatus)
     addNotch           = simSettings.channel.addNotch
     notchFreq          = simSettings.channel.notchFreq.value
     notchAttenuation   = simSettings.channel.notchAttenuation.value
+    portMap            = simSettings.channel.portMap
+    cacheChannels      = simSettings.channel.cacheChannels
+    decimate            = simSettings.channel.decimate
+    decimationSpan      = simSettings.channel.decimationSpan.value
+    decimationBandLimit = simSettings.channel.decimationBandLimit.value
+    truncationMode      = simSettings.channel.truncationMode
+    truncationEnergy    = simSettings.channel.truncationEnergy.value
+    truncationSpan      = simSettings.channel.truncationSpan.value
+    rationalModel       = simSettings.channel.rationalModel
+    rationalPoleCount   = int(simSettings.channel.rationalPoleCount.value)
+    rationalSpan        = simSettings.channel.rationalSpan.value
+    rationalTolerance   = simSettings.channel.rationalTolerance.value
     results = simResults.influenceSources.channel
     
     chNames = {'thru'} # Default (no crosstalk)
@@ -128,63 +149,21 @@ def createChannel(simSettings: simulationSettings, simResults: simulationStatus)
         results.thru.frequencies = freqs
 
     else:
+        # Import Touchstone (.s4p, .s8p...) channel data, parsed concurrently if desired
+        touchstoneNames = [name for name in chNames if isTouchstoneFile(importChannels.__dict__[name])]
+        touchstoneFiles = [importChannels.__dict__[name] for name in touchstoneNames]
+        touchstoneData = dict(zip(touchstoneNames, loadTouchstoneChannels(touchstoneFiles, portMap, cacheChannels, workerCount)))
+
         # Get frequency responses from channel descriptions
+        responses = {}
         for name in chNames:
             fileName = importChannels.__dict__[name]
 
             freqs = 0
             tranFunc = 0
 
-            # Import keystone (.s4p) channel data
-            if fileName[-4:] == '.s4p':
-                fileAddress = os.path.join('.', 'channels', fileName)
-                backplane = rf.Network(fileAddress)
-
-                freqs = backplane.f
-                freqPoints = freqs.size
-
-                # Get differential mode transfer function
-                # Start by preparing differential S-parameters
-                sParamsTemp = np.copy(backplane.s)
-                
-                sParamsTemp[:,1,:] = np.copy(backplane.s[:,2,:])
-                sParamsTemp[:,2,:] = np.copy(backplane.s[:,1,:])
-                
-                sParamsTemp[:,:,1] = np.copy(backplane.s[:,:,2])
-                sParamsTemp[:,:,2] = np.copy(backplane.s[:,:,1])
-                
-                sParamsTemp[:,1,2] = np.copy(backplane.s[:,1,2])
-                sParamsTemp[:,2,1] = np.copy(backplane.s[:,2,1])
-                
-                sParamsTemp[:,1,1] = np.copy(backplane.s[:,2,2])
-                sParamsTemp[:,2,2] = np.copy(backplane.s[:,1,1])
-        
-                M = np.array([[1,-1,0,0],[0,0,1,-1],[1,1,0,0],[0,0,1,1]])
-                invM = np.transpose(M)
-                
-                smmParams = np.zeros((4,4,freqPoints), dtype = complex)
-                
-                for i in range(freqPoints):
-                    smmParams[:,:,i] = (M@sParamsTemp[i,:,:]@invM)/2
-                
-                sParamsDiff = smmParams[0:2,0:2,:]
-                
-                # Assume source/load impedances of 50 ohm
-                zl = 50.0*np.ones((1,1,freqPoints))
-                zs = 50.0*np.ones((1,1,freqPoints))
-                z0 = backplane.z0[0,0]*np.ones((1,1,freqPoints))
-
-                # Reflection Coefficients
-                gammaL = (zl - z0) / (zl + z0)
-                gammaL[zl == np.inf] = 1 
-                
-                gammaS = (zs - z0) / (zs + z0)
-                gammaS[zs == np.inf] = 1
-                
-                gammaIn = (sParamsDiff[0,0,:] + sParamsDiff[0,1,:] * sParamsDiff[1,0,:] * gammaL) / (1 - sParamsDiff[1,1,:] * gammaL)
-                
-                tranFunc = sParamsDiff[1,0,:] * (1 + gammaL) * (1 - gammaS) / (1 - sParamsDiff[1,1,:] * gammaL) / (1 - gammaIn * gammaS) 
-                tranFunc = tranFunc.reshape(freqPoints,) 
+            if name in touchstoneData:
+                freqs, tranFunc = touchstoneData[name]
             
             elif fileName[-4:] == '.mat':
                 # If it's a .MAT file check for frequency points
@@ -221,8 +200,15 @@ def createChannel(simSettings: simulationSettings, simResults: simulationStatus)
                 notchTF = mag * np.exp(np.pi * phase)
                 tranFunc = tranFunc * notchTF
 
-                
-            # Combine xtalk responses
+            responses[name] = (freqs, tranFunc)
+
+        # Bring responses onto one frequency grid if they differ
+        responses = resampleChannels(responses)
+
+        # Combine xtalk responses
+        # Responses are combined in the order given to keep results independent of worker count
+        for name in chNames:
+            freqs, tranFunc = responses[name]
             if name[:4] == 'thru':
                 results.thru.transferFunction = tranFunc
                 results.thru.frequencies = freqs
@@ -242,40 +228,252 @@ def createChannel(simSettings: simulationSettings, simResults: simulationStatus)
                 results.xtalk.frequencies = freqs
                 results.xtalk.channelNumb = results.xtalk.channelNumb+1
 
-        # Create pulse response for all the combined channels
-        for name in results.__dict__:
+        if decimate:
+            print('\n----------Channel Decimation----------')
+        if rationalModel:
+            print('\n----------Rational Channel Models----------')
+
+        # Create impulse response (or rational model) for all the combined channels
+        names = list(results.__dict__)
+        kernelNames = []
+        impulseResponses = []
+        models = {}
+        for name in names:
 
             freqs = results.__dict__[name].frequencies
             tranFunc = results.__dict__[name].transferFunction
+
+            # Band-limit and resample the frequency response to shrink the impulse response
+            if decimate:
+                freqs, tranFunc, discardedEnergy = decimateFrequencyResponse(tranFunc, freqs, symbolRate, samplesPerSymb, decimationSpan, decimationBandLimit)
+                results.__dict__[name].discardedEnergy = discardedEnergy
+                print('{0:s}: {1:d} frequency points up to {2:.1f}GHz, {3:.3e}% of impulse energy discarded'.format(name, len(freqs), freqs[-1]/1e9, discardedEnergy*100))
+
+            # Fit rational model, only used if it is accurate enough
+            if rationalModel:
+                model = fitChannelModel(freqs, tranFunc, rationalPoleCount, cacheChannels)
+                results.__dict__[name].rationalModel = model
+                if model.fitError <= rationalTolerance:
+                    models[name] = model
+                    print('{0:s}: {1:d} poles, {2:.3f}ns delay removed, {3:.3e} relative RMS fit error'.format(name, len(model.poles), model.delay*1e9, model.fitError))
+                    continue
+                print('{0:s}: {1:.3e} relative RMS fit error is above tolerance, using sampled response instead'.format(name, model.fitError))
     
             # Create impulse response
-            
-            pulseResponse = impulseResponseConvolKernel(tranFunc, freqs, samplePeriod)
-        
-            # Create ideal pulse response with rise time
-            riseIdx = round(tRise/samplePeriod)
-            idealPulse = np.concatenate((np.zeros((preCursorCount*samplesPerSymb,)),np.linspace(0,1,riseIdx),np.ones((samplesPerSymb-riseIdx,)),np.linspace(1,0,riseIdx),np.zeros((postCursorCount*samplesPerSymb-riseIdx,))))
+            kernelNames.append(name)
+            impulseResponses.append(impulseResponseConvolKernel(tranFunc, freqs, samplePeriod))
+
+        # Truncate impulse responses to a window around their peak
+        if truncationMode != 'none' and len(impulseResponses) > 0:
+            impulseResponses = truncateImpulseResponses(impulseResponses, kernelNames, results, truncationMode, truncationEnergy, round(truncationSpan*samplesPerSymb))
         
-            # Apply pulse response to channel
+        # Create ideal pulse response with rise time
+        riseIdx = round(tRise/samplePeriod)
+        idealPulse = np.concatenate((np.zeros((preCursorCount*samplesPerSymb,)),np.linspace(0,1,riseIdx),np.ones((samplesPerSymb-riseIdx,)),np.linspace(1,0,riseIdx),np.zeros((postCursorCount*samplesPerSymb-riseIdx,))))
+
+        # Apply pulse response to channels, all at once if their kernels have the same length
+        pulseResponses = {}
+        if addChannel:
+            if len({len(impulseResponse) for impulseResponse in impulseResponses}) == 1:
+                pulseResponses = dict(zip(kernelNames, convolveSame(np.array(impulseResponses), idealPulse)))
+            else:
+                pulseResponses = {name: convolveSame(impulseResponse, idealPulse) for name, impulseResponse in zip(kernelNames, impulseResponses)}
+
+            # Filter pulse through rational models
+            pulseInput = np.concatenate((idealPulse, np.zeros((round(rationalSpan*samplesPerSymb),))))
+            for name in models:
+                pulseResponses[name] = filterWithModel(models[name], pulseInput, samplePeriod)
+
+        for name in names:
             if not addChannel:
                 if name[0:3] == 'thru':
-                    pulseResponse = np.convolve(np.concatenate((1, np.zeros((len(pulseResponse),)))), idealPulse, 'same')
+                    pulseResponse = np.convolve(np.concatenate((1, np.zeros((len(impulseResponses[kernelNames.index(name)]),)))), idealPulse, 'same')
                 else:
                     pulseResponse = np.zeros((len(idealPulse),))
             else:
-                pulseResponse = np.convolve(pulseResponse,idealPulse,'same')
+                pulseResponse = pulseResponses[name]
     
             # Save pulse response
             results.__dict__[name].pulseResponse = pulseResponse
 
 
+###########################################################################
+# This function brings the frequency responses of all channel files onto a
+# shared uniform frequency grid, so files measured at different points can
+# be power-summed and give impulse responses of the same length. Responses
+# already sharing one uniform grid are returned unchanged.
+#
+# The grid covers the frequencies common to every file at the finest step
+# among them. The magnitude and unwrapped phase of every response are
+# interpolated in a single call by offsetting the frequencies of each file
+# into a range of their own.
+###########################################################################
+def resampleChannels(responses: dict) -> dict:
+
+    names = list(responses)
+    grids = [np.ravel(responses[name][0]).astype(float) for name in names]
+
+    # Keep data that already shares one uniform grid
+    steps = np.diff(grids[0])
+    uniform = len(steps) < 2 or np.allclose(steps, steps[0], rtol=1e-6, atol=0)
+    if uniform and all(np.array_equal(grid, grids[0]) for grid in grids[1:]):
+        return responses
+
+    # Find common grid
+    fMin = max(grid[0] for grid in grids)
+    fMax = min(grid[-1] for grid in grids)
+    fStep = min(np.median(np.diff(grid)) for grid in grids)
+    if fMax <= fMin:
+        print('ERROR: The channel files do not share a common frequency range to resample them onto.\n----------------SIMULATION ABORTING----------------')
+        quit()
+    freqs = fMin + fStep*np.arange(int(np.floor((fMax-fMin)/fStep + 1e-9)) + 1)
+
+    # Interpolate every response at once, each file offset into its own range
+    offsets = (max(grid[-1] for grid in grids) + fStep) * np.arange(len(names))
+    samplePoints = np.concatenate([grid + offset for grid, offset in zip(grids, offsets)])
+    tranFuncs = [np.ravel(responses[name][1]) for name in names]
+    samples = np.concatenate([np.abs(tranFunc) + 1j*np.unwrap(np.angle(tranFunc)) for tranFunc in tranFuncs])
+    resampled = np.interp((freqs[np.newaxis, :] + offsets[:, np.newaxis]).ravel(), samplePoints, samples).reshape((len(names), len(freqs)))
+    tranFuncs = resampled.real * np.exp(1j*resampled.imag)
+
+    print('\n----------Channel Resampling----------')
+    print('{0:d} channel responses resampled onto {1:d} frequency points from {2:.3f}GHz to {3:.3f}GHz'.format(len(names), len(freqs), freqs[0]/1e9, freqs[-1]/1e9))
+
+    return {name: (freqs, tranFunc) for name, tranFunc in zip(names, tranFuncs)}
+
+
+###########################################################################
+# This function tabulates the CTLE responses of every knob setting allowed
+# on the thru channel's frequencies, so they do not need to be calculated
+# for each setting tried.
+###########################################################################
+def createCTLETable(simSettings: simulationSettings, simResults: simulationStatus):
+
+    # Import variables
+    addEqualization = simSettings.receiver.CTLE.addEqualization
+    zeroFreq        = simSettings.receiver.CTLE.zeroFreq
+    pole1Freq       = simSettings.receiver.CTLE.pole1Freq
+    pole2Freq       = simSettings.receiver.CTLE.pole2Freq
+    cacheChannels   = simSettings.channel.cacheChannels
+    channelFreqs = simResults.influenceSources.channel.thru.frequencies
+
+    if not addEqualization:
+        return
+
+    lattice = CTLELattice([zeroFreq, pole1Freq, pole2Freq])
+    table = loadCTLETable(lattice, channelFreqs, cacheChannels)
+
+    # Save results
+    simResults.influenceSources.CTLETable = table
+
+
+###########################################################################
+# Truncates centred impulse responses to a window around their peak. In
+# 'span' mode the window has a fixed number of samples. In 'energy' mode it
+# is the narrowest window holding the desired fraction of the response's
+# energy. The window stays centred on the peak. The fraction of energy
+# discarded is saved with each channel and printed.
+###########################################################################
+def truncateImpulseResponses(impulseResponses: list, names: list, results, mode: str, energyFraction: float, spanSamples: int) -> list:
+
+    print('\n----------Impulse Response Truncation----------')
+    truncatedResponses = []
+    for name, impulseResponse in zip(names, impulseResponses):
+        peakIndex = np.argmax(impulseResponse)
+        cumulativeEnergy = np.concatenate(([0], np.cumsum(impulseResponse**2)))
+
+        # Find half width of window
+        widths = np.arange(min(peakIndex, len(impulseResponse)-peakIndex-1) + 1)
+        if mode == 'span':
+            halfWidth = min(spanSamples // 2, widths[-1])
+        else:
+            windowEnergy = cumulativeEnergy[peakIndex+widths+1] - cumulativeEnergy[peakIndex-widths]
+            halfWidth = min(np.searchsorted(windowEnergy, energyFraction*cumulativeEnergy[-1]), widths[-1])
+
+        # Apply window
+        truncatedResponse = impulseResponse[peakIndex-halfWidth:peakIndex+halfWidth+1]
+
+        keptEnergy = cumulativeEnergy[peakIndex+halfWidth+1] - cumulativeEnergy[peakIndex-halfWidth]
+        discardedEnergy = 1 - keptEnergy / cumulativeEnergy[-1] if cumulativeEnergy[-1] > 0 else 0
+        results.__dict__[name].truncatedEnergy = discardedEnergy
+        print('{0:s}: kept {1:d} of {2:d} samples, {3:.3e}% of impulse energy discarded'.format(name, len(truncatedResponse), len(impulseResponse), discardedEnergy*100))
+
+        truncatedResponses.append(truncatedResponse)
+
+    return truncatedResponses
+
+
+###########################################################################
+# Convolves responses with a pulse using overlap-add FFT convolution. Rows
+# of a 2D array of responses are all convolved in one call. The output
+# matches np.convolve(response, pulse, 'same') for each response.
+###########################################################################
+def convolveSame(responses: np.ndarray, pulse: np.ndarray) -> np.ndarray:
+
+    responseLength = responses.shape[-1]
+    pulse = np.reshape(pulse, (1,)*(responses.ndim-1) + (-1,))
+
+    # Keep the centre of the full convolution (as np.convolve does)
+    fullResponse = signal.oaconvolve(responses, pulse, mode='full', axes=-1)
+    start = (min(responseLength, pulse.shape[-1]) - 1) // 2
+
+    return fullResponse[..., start:start + max(responseLength, pulse.shape[-1])]
+
+
+###########################################################################
+# Band-limits a frequency response before it is turned into an impulse
+# response.
+#
+# The response is first brought to the time domain at its native sampling
+# rate, where a window spanning the given number of UI is kept around the
+# impulse peak. Transforming the window back gives a frequency grid with a
+# step of 1/span, which is then trimmed at the band limit (a multiple of
+# the symbol rate, never above the simulation's Nyquist frequency). The
+# resulting impulse kernel is much shorter than one made from the full
+# measurement. The fraction of impulse energy lost to windowing and
+# trimming is returned so the accuracy loss can be judged.
+###########################################################################
+def decimateFrequencyResponse(frequencyResponse, freqs, symbolRate: float, samplesPerSymb: int, spanUI: float, bandLimit: float):
+
+    # Get impulse response at native sampling rate
+    impulseResponse = fft.irfft(frequencyResponse)
+    nativePeriod = 1 / (len(impulseResponse) * (freqs[1] - freqs[0]))
+    totalEnergy = np.sum(impulseResponse**2)
+
+    # Keep window around peak (mostly after it as channels are causal)
+    windowLength = min(len(impulseResponse), 2*int(round(spanUI / (2 * symbolRate * nativePeriod)))) # Even to keep native Nyquist frequency
+    start = np.argmax(np.abs(impulseResponse)) - windowLength // 4
+    window = np.take(impulseResponse, np.arange(start, start + windowLength), mode='wrap')
+
+    # Transform back onto a coarser frequency grid
+    windowResponse = fft.rfft(window)
+    windowFreqs = fft.rfftfreq(windowLength, nativePeriod)
+
+    # Trim frequencies above band limit
+    cutoff = min(bandLimit * symbolRate, samplesPerSymb * symbolRate / 2)
+    keep = windowFreqs <= cutoff
+
+    # Determine energy kept (Parseval's theorem for a one-sided spectrum)
+    weights = np.full((len(windowResponse),), 2.0)
+    weights[0] = 1
+    if windowLength % 2 == 0:
+        weights[-1] = 1
+    keptEnergy = np.sum(weights[keep] * np.abs(windowResponse[keep])**2) / windowLength
+    discardedEnergy = max(0.0, 1 - keptEnergy / totalEnergy)
+
+    return windowFreqs[keep], windowResponse[keep], discardedEnergy
+
+
 ###########################################################################
 # Generates the convolution kernel for an impulse given a system's 
 # frequency response.
 #
-# Pads discrete time transfer frequency response with data in the frequency
-# domain to reach the needed step in time domain when an inverse Fourier
-# Transform is performed.
+# The one-sided frequency response is put through an inverse real Fourier
+# Transform of length 1/(fStep*samplePeriod), which implicitly zero-pads it
+# so the time response comes out at the simulation sample rate. When that
+# length is not a whole number the response is transformed at a fast FFT
+# length instead and resampled by an exact rational ratio with a polyphase
+# filter. The kernel sums to the DC gain of the response.
 #
 # This kernel is generally quite large so there is the option to have a 
 # window around the peak.
@@ -299,38 +497,37 @@ def impulseResponseConvolKernel(frequencyResponse, freqs, samplePeriod: float) -
         fStep = workFreqs[1] - workFreqs[0]
     else:
         # Use data as it came in
-        workFreqs = freqs
         workFrequencyResponse = frequencyResponse
 
 
-    # Find oversampling factor to pad frequency response with
-    samplePeriod0 = 1 / (2*freqs[-1])
-    upConvert = int(np.ceil(samplePeriod0/samplePeriod))
-
-    # Pad response with zeros
-    freqRespPadded = np.concatenate((workFrequencyResponse, np.zeros((len(workFrequencyResponse)*(upConvert-1),))))
-
-    # To create an impulse response the padded frequency response is reflected
-    # then put through an inverse Fourier Transform to get the time response
-    tempH = np.concatenate((freqRespPadded, np.conj(np.flip(freqRespPadded[1:-1]))))
-    impulseResponse = np.real(np.fft.ifft(tempH))
+    # Number of samples in one period of the time response
+    periodSamples = 1 / (fStep * samplePeriod)
+    kernelLength = int(round(periodSamples))
 
+    if abs(periodSamples - kernelLength) <= 1e-9 * periodSamples:
+        # Sample rate is a multiple of the frequency step, transform directly
+        impulseResponse = fft.irfft(workFrequencyResponse, kernelLength)
+    else:
+        # Transform at a fast length, then resample to the exact sample period
+        fastLength = fft.next_fast_len(int(np.ceil(periodSamples)), real=True)
+        impulseResponse = fft.irfft(workFrequencyResponse, fastLength)
+        ratio = Fraction(periodSamples / fastLength).limit_denominator(1000)
+        impulseResponse = centerPeak(impulseResponse) # Keep filter edge effects away from the peak
+        impulseResponse = signal.resample_poly(impulseResponse, ratio.numerator, ratio.denominator) / float(ratio)
 
     # Center pulse
-    maxValueIndex = np.argmax(impulseResponse)
-    impulseResponse = np.concatenate((impulseResponse[maxValueIndex:],impulseResponse[:maxValueIndex]))
-    midPoint = int(len(impulseResponse) / 2)
-    impulseResponse = np.concatenate((impulseResponse[midPoint:],impulseResponse[:midPoint]))
-
-
-    # Ensure exact same sampling rate
-    time = np.linspace(0, 1/(2*freqs[-1]*upConvert), len(impulseResponse))
-    time2 = np.linspace(0, samplePeriod, len(impulseResponse))
-    impulseResponse = np.interp(time, time2, impulseResponse, left=0, right=0)
+    impulseResponse = centerPeak(impulseResponse)
     
     return impulseResponse # Return unchanged response (will be large!)
 
 
+###########################################################################
+# Circularly shifts a response so its peak lands in the middle.
+###########################################################################
+def centerPeak(response: np.ndarray) -> np.ndarray:
+    return np.roll(response, len(response) - len(response) // 2 - np.argmax(response))
+
+
 # Classes used to easily append jitter and distortion data 
 class jitter:
     def __init__(self, rj, sj, dcdj, hist, ts, uis):
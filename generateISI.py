@@ -15,7 +15,24 @@
 # individual cursors, it then determine all combinations of pre, main and 
 # post cursor data levels and multiplies the pulse response by the
 # combination, finally it superimposes the summation of each combination,
-# creating several signal traces resembling an eye diagram. 
+# creating several signal traces resembling an eye diagram. Combinations
+# are kept as rows of a matrix, so all trajectories of a channel are found
+# with one matrix product.
+#
+# Alternatively, the ISI distribution can be built statistically. Only the
+# cursors which classify a transition are enumerated, the distribution of
+# the others is found by convolving the distribution of each cursor on a
+# grid finer than the y-axis. This scales linearly with the number of cursors rather than
+# exponentially, at the cost of rounding each cursor to the grid.
+#
+# Every combination can also be enumerated in blocks of limited size which
+# are histogrammed straight away, so memory use does not depend on the
+# number of combinations. Trajectories are not kept in this case.
+#
+# Negating every data level negates a trajectory, so each transition has
+# a mirrored transition whose distribution is its own reflected about zero.
+# When enumerating, only one transition of each pair may be enumerated with
+# the other marked as its mirror, halving the work.
 #
 # Inputs:
 #   simSettings: structure containing simulation settings
@@ -25,20 +42,29 @@
 
 from userSettingsObjects import simulationSettings, nothing
 from initializeSimulation import simulationStatus
+from runConcurrently import mapConcurrently
+from generatePDF import binTrajectories
 import numpy as np
-import copy
+
+convolutionOversampling = 32 # Steps of the convolution grid per y-axis bin
 
 def generateISI(simSettings: simulationSettings, simResults: simulationStatus):
     
     # Import variables
     signalingMode   = simSettings.general.signalingMode
+    ISIMode         = simSettings.general.ISIMode
+    blockSize       = int(simSettings.general.ISIBlockSize.value)
+    foldISI         = simSettings.general.foldISI
     samplesPerSymb  = simSettings.general.samplesPerSymb.value
+    yAxis           = simSettings.general.yAxis.value
+    yIncrement      = simSettings.general.yIncrement.value
     modulation      = simSettings.general.modulation.value
     levelNumb       = simSettings.general.levelNumb.value
     preCursorCount  = simSettings.transmitter.preCursorCount.value
     postCursorCount = simSettings.transmitter.postCursorCount.value
     cursorCount     = simSettings.transmitter.cursorCount.value  
     approximate     = simSettings.channel.approximate
+    workerCount     = int(simSettings.general.workerCount.value)
     speedUpSim      = simSettings.adaption.speedUpSim
     pulses = simResults.pulseResponse.receiver.outputs
 
@@ -50,10 +76,29 @@ def generateISI(simSettings: simulationSettings, simResults: simulationStatus):
 
     # Break if simulation has already failed
     if not simResults.results.successful: return 
+
+    # Combinations without DC component are always enumerated, there are only a few of them
+    statistical = ISIMode == 'convolve' and signalingMode != 'clock'
+    streamed = ISIMode == 'stream' and signalingMode != 'clock'
+    folded = foldISI and ISIMode in ['enumerate', 'stream'] and signalingMode != 'clock'
     
     if speedUpSim:
         # Take previous results if repeat simulation
         transitions = simResults.eyeGeneration.ISI.thru
+    elif statistical or streamed or folded:
+        # Determine combinations of the cursors classifying transitions
+        combinations = generateTransitionCombinations(cursorCount, preCursorCount, signalingMode, modulation)
+
+        # Clasify ISI distributions by transition
+        transitions = clasifyTrajectories(combinations, preCursorCount, signalingMode)
+
+        # Mark the mirror of each transition enumerated
+        if folded:
+            foldTransitions(transitions, transitionCursors(preCursorCount, signalingMode), modulation)
+
+        # Determine all cursor combinations of the transitions enumerated
+        if folded and not streamed:
+            expandTransitions(transitions, transitionCursors(preCursorCount, signalingMode), modulation)
     else:
         # Determine all cursor combinations
         combinations = generateCursorCombinations(cursorCount, signalingMode, modulation, levelNumb)
@@ -61,24 +106,30 @@ def generateISI(simSettings: simulationSettings, simResults: simulationStatus):
         # Clasify ISI trajectories classified by transition
         transitions = clasifyTrajectories(combinations, preCursorCount, signalingMode)
     
-    # Loop through each available channel file
-    for chName in pulses.__dict__:
-        
-        # Skip required channels
-        if approximate:
-            if chName not in['thru', 'xtalk']:
-                continue
-        else:
-            if chName in ['next', 'fext', 'xtalk']:
-                continue
+    # Skip required channels
+    if approximate:
+        chNames = [chName for chName in pulses.__dict__ if chName in ['thru', 'xtalk']]
+    else:
+        chNames = [chName for chName in pulses.__dict__ if chName not in ['next', 'fext', 'xtalk']]
+
+    # Loop through each available channel file (concurrently if desired)
+    def channelISI(chName):
 
         # Split pulse into symbol portions
         splitPul = splitPulse(pulses.__dict__[chName], preCursorCount, postCursorCount, samplesPerSymb)
 
+        # Apply cursor distributions to the split pulse response
+        if statistical:
+            return applyCursorDistributions(transitions, splitPul, transitionCursors(preCursorCount, signalingMode), modulation, yAxis, yIncrement)
+
+        # Apply every cursor combination to the split pulse response, one block at a time
+        if streamed:
+            return applyCursorBlocks(transitions, splitPul, transitionCursors(preCursorCount, signalingMode), modulation, blockSize, yAxis, yIncrement)
+
         # Apply cursor combinations to the split pulse response
-        # Need to make a copy to have seperate objects for each channel
-        temp = copy.deepcopy(transitions) # Copy to new object before it gets filled with more data
-        applyCursorCombination(temp, splitPul, samplesPerSymb)
+        return applyCursorCombination(transitions, splitPul)
+
+    for chName, temp in zip(chNames, mapConcurrently(channelISI, chNames, workerCount)):
         setattr(result, chName, temp)
     
     
@@ -87,77 +138,125 @@ def generateISI(simSettings: simulationSettings, simResults: simulationStatus):
 
 
 ###########################################################################
-# The following functions returns a structure containing all possible 
-# cursor combinations. The number of levels is dictated by the modulation 
-# scheme and the number of cursors. If a signaling mode such as clock is
-# selected, combinations which do not have DC components will be created.
+# The following functions returns all possible cursor combinations as a
+# matrix of symbols (one row per combination, pre-cursors first) and the
+# matching matrix of polar [-1 1] data levels. The number of levels is
+# dictated by the modulation scheme and the number of cursors. If a
+# signaling mode such as clock is selected, combinations which do not have
+# DC components will be created.
 ###########################################################################
 def generateCursorCombinations(cursorCount, signalingMode, modulation, levelNumb):
-    ISI = nothing()
 
-    # Create combinations with DC component
+    # Create combinations with DC component, counting up in base-M
     if signalingMode in ['standard', '1+D', '1+0.5D']:
-        for combination in range(modulation**cursorCount):
-            baseM = np.base_repr(combination, base=modulation) # create base-M value from combination
-
-            vector = np.zeros((cursorCount-len(baseM),))
-            for number in baseM:
-                vector = np.concatenate((vector, [float(number)]))
-
-            symbolName = 'c'
-            for number in vector:
-                symbolName = '{0:s}{1:d}'.format(symbolName, int(number))
-
-            polar = np.interp(vector, [0, modulation-1], [-1,1]) # gets polar [-1 1] base-M vector
-            setattr(ISI, symbolName, nothing())
-            ISI.__dict__[symbolName].cursors = polar
-        
+        symbols = np.indices((modulation,)*cursorCount).reshape((cursorCount, -1)).T
+        polar = np.interp(symbols, [0, modulation-1], [-1,1]) # gets polar [-1 1] base-M vectors
             
     # Create combinations without DC component
     else:
-        for level in range(levelNumb):
-            vector = np.ones((cursorCount,))*level
-            for index in np.arange(1,cursorCount, 2):
-                vector[index] = levelNumb-1-vector[index] # invert every other bit
-            
-            polar = np.interp(vector, [0,levelNumb-1],[-1,1]) # gets polar [-1 1] base-M vector
+        symbols = np.repeat(np.arange(levelNumb)[:, np.newaxis], cursorCount, axis=1)
+        symbols[:, 1::2] = levelNumb-1-symbols[:, 1::2] # invert every other bit
+        polar = np.interp(symbols, [0,levelNumb-1],[-1,1]) # gets polar [-1 1] base-M vectors
+        
+    return symbols, polar
 
-            symbolName = 'c'
-            for number in vector:
-                symbolName = '{0:s}{1:d}'.format(symbolName, int(number))
 
-            setattr(ISI, symbolName, nothing())
-            ISI.__dict__[symbolName].cursors = polar
-        
-    return ISI
+###########################################################################
+# This function returns the positions of the cursors which classify a
+# transition (pre, main and post cursor) in a combination of cursors.
+###########################################################################
+def transitionCursors(preCursorCount, signalingMode) -> list:
+
+    if signalingMode in ['1+D', '1+0.5D'] or preCursorCount == 0:
+        return [preCursorCount, preCursorCount+1]
+    
+    return [preCursorCount-1, preCursorCount, preCursorCount+1]
+
+
+###########################################################################
+# This function returns all combinations of the cursors which classify a
+# transition, in the same form and order as generateCursorCombinations.
+# The remaining cursors are left at the lowest level, they are accounted
+# for by their distribution instead.
+###########################################################################
+def generateTransitionCombinations(cursorCount, preCursorCount, signalingMode, modulation):
+
+    fixedCursors = transitionCursors(preCursorCount, signalingMode)
+
+    symbols = np.zeros((modulation**len(fixedCursors), cursorCount), dtype=int)
+    symbols[:, fixedCursors] = np.indices((modulation,)*len(fixedCursors)).reshape((len(fixedCursors), -1)).T
+    polar = np.interp(symbols, [0, modulation-1], [-1,1]) # gets polar [-1 1] base-M vectors
+
+    return symbols, polar
+
+
+###########################################################################
+# This function marks every transition whose cursors classifying it are
+# those of an earlier transition with every level negated. Such a
+# transition is not enumerated, its distribution is reflected from the
+# earlier one instead. Transitions which are their own mirror are kept.
+###########################################################################
+def foldTransitions(ISI, fixedCursors, modulation):
+
+    enumerated = {}
+    for transName in ISI.__dict__:
+        fixedSymbols = tuple(ISI.__dict__[transName].symbols[0, fixedCursors])
+        mirrorSymbols = tuple(modulation-1-symbol for symbol in fixedSymbols)
+        if mirrorSymbols in enumerated:
+            ISI.__dict__[transName].mirror = enumerated[mirrorSymbols]
+        else:
+            enumerated[fixedSymbols] = transName
+
+
+###########################################################################
+# This function replaces the single combination of every transition not
+# marked as a mirror by all combinations of the remaining cursors, in the
+# same order as generateCursorCombinations.
+###########################################################################
+def expandTransitions(ISI, fixedCursors, modulation):
+
+    symbols = ISI.__dict__[list(ISI.__dict__)[0]].symbols
+    freeCursors = [cursor for cursor in range(symbols.shape[1]) if cursor not in fixedCursors]
+    freeSymbols = np.indices((modulation,)*len(freeCursors)).reshape((len(freeCursors), -1)).T
+
+    for transName in ISI.__dict__:
+        if 'mirror' in ISI.__dict__[transName].__dict__:
+            continue
+
+        symbols = np.repeat(ISI.__dict__[transName].symbols[:1], len(freeSymbols), axis=0)
+        symbols[:, freeCursors] = freeSymbols
+        ISI.__dict__[transName].symbols = symbols
+        ISI.__dict__[transName].cursors = np.interp(symbols, [0, modulation-1], [-1,1]) # gets polar [-1 1] base-M vectors
 
 
 ###########################################################################
 # This function classifies all trajectories based on the pre, main and post
 # cursor transitions. All three are required for generating edge BER plots.
 # It should be noted that the order of cursors is reversed to account for
-# time.
+# time. Each transition keeps the symbols and polar levels of its
+# combinations, in the order they were generated.
 ###########################################################################
-def clasifyTrajectories(ISI, preCursorCount, signalingMode):
+def clasifyTrajectories(combinations, preCursorCount, signalingMode):
     
+    symbols, polar = combinations
     classifiedISI = nothing()
 
-    for name in ISI.__dict__:
-        preCursor  = name[preCursorCount+0]
-        mainCursor = name[preCursorCount+1]
-        postCursor = name[preCursorCount+2]
-        if signalingMode in ['1+D', '1+0.5D']:
-            if not ('trans'+postCursor+mainCursor) in classifiedISI.__dict__:
-                setattr(classifiedISI, ('trans'+postCursor+mainCursor), nothing())
-            if not name in classifiedISI.__dict__[('trans'+postCursor+mainCursor)].__dict__:
-                setattr(classifiedISI.__dict__[('trans'+postCursor+mainCursor)], name, nothing())
-            classifiedISI.__dict__[('trans'+postCursor+mainCursor)].__dict__[name].cursors = ISI.__dict__[name].cursors
-        else:
-            if not ('trans'+postCursor+mainCursor+preCursor) in classifiedISI.__dict__:
-                setattr(classifiedISI, ('trans'+postCursor+mainCursor+preCursor), nothing())
-            if not name in classifiedISI.__dict__[('trans'+postCursor+mainCursor+preCursor)].__dict__:
-                setattr(classifiedISI.__dict__[('trans'+postCursor+mainCursor+preCursor)], name, nothing())
-            classifiedISI.__dict__[('trans'+postCursor+mainCursor+preCursor)].__dict__[name].cursors = ISI.__dict__[name].cursors
+    # Name transitions by their post, main and pre cursor symbols (without pre-cursors the pre symbol is 'c')
+    postCursor = np.char.mod('%d', symbols[:, preCursorCount+1])
+    mainCursor = np.char.mod('%d', symbols[:, preCursorCount])
+    if signalingMode in ['1+D', '1+0.5D']:
+        transNames = np.char.add(np.char.add('trans', postCursor), mainCursor)
+    else:
+        preCursor = np.char.mod('%d', symbols[:, preCursorCount-1]) if preCursorCount > 0 else np.full((len(symbols),), 'c')
+        transNames = np.char.add(np.char.add(np.char.add('trans', postCursor), mainCursor), preCursor)
+
+    # Group combinations, keeping transitions in order of first appearance
+    uniqueNames, firstIndex, inverse = np.unique(transNames, return_index=True, return_inverse=True)
+    for group in np.argsort(firstIndex):
+        rows = np.flatnonzero(inverse == group)
+        setattr(classifiedISI, str(uniqueNames[group]), nothing())
+        classifiedISI.__dict__[str(uniqueNames[group])].symbols = symbols[rows]
+        classifiedISI.__dict__[str(uniqueNames[group])].cursors = polar[rows]
         
     return classifiedISI
 
@@ -190,22 +289,135 @@ def splitPulse(pulse, preCursorCount, postCursorCount, samplesPerSymb):
 
 ###########################################################################
 # This function applies the cursor combinations to the split pulse 
-# response. This creates all possible signal trajectories due to ISI.
+# response. This creates all possible signal trajectories due to ISI, as a
+# (combinations x cursors) by (cursors x samples) matrix product done once
+# for every transition together. Returns a new structure of transitions,
+# each with a matrix of trajectories (one row per combination) or the name
+# of the transition it mirrors.
 ###########################################################################
-def applyCursorCombination(ISI, splitPulse, samplesPerSymb):
+def applyCursorCombination(ISI, splitPulse):
+
+    # Stack cursors and combinations (mirrored transitions are reflected later)
+    cursors = np.array([splitPulse.__dict__[cursor] for cursor in splitPulse.__dict__])
+    transNames = [transName for transName in ISI.__dict__ if 'mirror' not in ISI.__dict__[transName].__dict__]
+    combinations = np.concatenate([ISI.__dict__[transName].cursors for transName in transNames])
+
+    # Superimpose all cursors multiplied by their data levels
+    trajectories = np.split(combinations @ cursors, np.cumsum([len(ISI.__dict__[transName].cursors) for transName in transNames])[:-1])
+    trajectories = dict(zip(transNames, trajectories))
 
-    # Loop through transitions
-    cursors = list(splitPulse.__dict__)
+    # Save results
+    channelISI = nothing()
     for transName in ISI.__dict__:
+        setattr(channelISI, transName, nothing())
+        channelISI.__dict__[transName].symbols = ISI.__dict__[transName].symbols
+        channelISI.__dict__[transName].cursors = ISI.__dict__[transName].cursors
+        if transName in trajectories:
+            channelISI.__dict__[transName].trajectories = trajectories[transName]
+        else:
+            channelISI.__dict__[transName].mirror = ISI.__dict__[transName].mirror
 
-        # Loop through combinations
-        for comb in ISI.__dict__[transName].__dict__:
-            
-            # Loop through cursors while superimposing transformation
-            vector = ISI.__dict__[transName].__dict__[comb].cursors
-            ISI.__dict__[transName].__dict__[comb].trajectory = np.zeros((samplesPerSymb,))
-            
-            for pos in range(len(vector)):
-                offset = splitPulse.__dict__[cursors[pos]] * vector[pos] # multiply cursor by data levels
-                ISI.__dict__[transName].__dict__[comb].trajectory = ISI.__dict__[transName].__dict__[comb].trajectory + offset
-    
+    return channelISI
+
+
+###########################################################################
+# This function builds the ISI distribution of every transition without
+# enumerating all combinations. The levels of each remaining cursor are
+# rounded to a grid finer than the y-axis and their distributions are
+# convolved together (by shifting and adding, so no round-off is
+# introduced) for all samples at once. Each transition then shifts this
+# distribution by the sum of its own cursors. Returns a new structure of
+# transitions, each with a histogram of the number of combinations on the
+# y-axis at each sample (as generateHist would count from trajectories).
+###########################################################################
+def applyCursorDistributions(ISI, splitPulse, fixedCursors, modulation, yAxis, yIncrement):
+
+    # Stack cursors and find those left to convolve
+    cursors = np.array([splitPulse.__dict__[cursor] for cursor in splitPulse.__dict__])
+    freeCursors = [cursor for cursor in range(len(cursors)) if cursor not in fixedCursors]
+    samplesPerSymb = cursors.shape[1]
+    levels = np.interp(np.arange(modulation), [0, modulation-1], [-1,1])
+    sampleIndex = np.arange(samplesPerSymb)
+
+    # Convolve the distribution of every remaining cursor, on a grid finer than the y-axis
+    distribution = np.ones((1, samplesPerSymb))
+    lowestStep = 0
+    for cursor in freeCursors:
+        steps = np.round(levels[:, np.newaxis]*cursors[cursor][np.newaxis, :]*convolutionOversampling/yIncrement).astype(int)
+        rows = np.arange(len(distribution))[:, np.newaxis]
+        convolved = np.zeros((len(distribution)+np.max(steps)-np.min(steps), samplesPerSymb))
+        for levelSteps in steps:
+            convolved[rows+levelSteps-np.min(steps), sampleIndex] += distribution/modulation # Each level is equally likely
+        distribution = convolved
+        lowestStep = lowestStep + np.min(steps)
+    distribution = distribution * float(modulation)**len(freeCursors) # Number of combinations
+
+    # Shift distribution by the cursors of each transition and gather it into y-axis bins
+    channelISI = nothing()
+    for transName in ISI.__dict__:
+        fixedSum = ISI.__dict__[transName].cursors[0, fixedCursors] @ cursors[fixedCursors]
+        offsets = (lowestStep + np.arange(len(distribution))[:, np.newaxis]) / convolutionOversampling
+        bins = np.floor((fixedSum-yAxis[0])/yIncrement + 0.5 + offsets).astype(int)
+        inRange = (bins >= 0) & (bins < len(yAxis)) # Values off the y-axis are clipped, as np.histogram does
+
+        histogram = np.bincount((bins*samplesPerSymb + sampleIndex)[inRange], distribution[inRange], len(yAxis)*samplesPerSymb)
+        histogram = np.reshape(histogram, (len(yAxis), samplesPerSymb))
+
+        # Save results
+        setattr(channelISI, transName, nothing())
+        channelISI.__dict__[transName].symbols = ISI.__dict__[transName].symbols
+        channelISI.__dict__[transName].cursors = ISI.__dict__[transName].cursors
+        channelISI.__dict__[transName].histogram = histogram
+
+    return channelISI
+
+
+###########################################################################
+# This function applies every cursor combination to the split pulse
+# response like applyCursorCombination, but in blocks of combinations that
+# are histogrammed by transition before the next block is made. The
+# combinations of each transition not marked as a mirror are counted up
+# in base-M, mirrored transitions are reflected from their histogram.
+# Returns a new structure of transitions, each with a histogram of the
+# number of combinations on the y-axis at each sample.
+###########################################################################
+def applyCursorBlocks(ISI, splitPulse, fixedCursors, modulation, blockSize, yAxis, yIncrement):
+
+    # Stack cursors
+    cursors = np.array([splitPulse.__dict__[cursor] for cursor in splitPulse.__dict__])
+    cursorCount, samplesPerSymb = cursors.shape
+    levels = np.interp(np.arange(modulation), [0, modulation-1], [-1,1]) # polar [-1 1] level of each symbol
+
+    # Find transitions to enumerate and the cursors left free in each
+    transNames = list(ISI.__dict__)
+    enumeratedNames = [transName for transName in transNames if 'mirror' not in ISI.__dict__[transName].__dict__]
+    fixedSymbols = np.array([ISI.__dict__[transName].symbols[0, fixedCursors] for transName in enumeratedNames])
+    freeCursors = [cursor for cursor in range(cursorCount) if cursor not in fixedCursors]
+    freeCount = modulation**len(freeCursors)
+    freePowers = modulation**np.arange(len(freeCursors)-1, -1, -1, dtype=np.int64)
+    combinationCount = len(enumeratedNames)*freeCount
+
+    # Enumerate, superimpose and histogram one block of combinations at a time
+    histograms = np.zeros((len(enumeratedNames), len(yAxis), samplesPerSymb))
+    for start in range(0, combinationCount, blockSize):
+        combinations = np.arange(start, min(start+blockSize, combinationCount), dtype=np.int64)
+        transitionIndex = combinations // freeCount
+        symbols = np.zeros((len(combinations), cursorCount), dtype=np.int64)
+        symbols[:, fixedCursors] = fixedSymbols[transitionIndex]
+        symbols[:, freeCursors] = (combinations[:, np.newaxis] % freeCount // freePowers) % modulation
+        trajectories = levels[symbols] @ cursors
+        binTrajectories(histograms, trajectories, transitionIndex, yAxis, yIncrement)
+
+    # Save results
+    channelISI = nothing()
+    for transName in transNames:
+        setattr(channelISI, transName, nothing())
+        channelISI.__dict__[transName].symbols = ISI.__dict__[transName].symbols
+        channelISI.__dict__[transName].cursors = ISI.__dict__[transName].cursors
+        if transName in enumeratedNames:
+            channelISI.__dict__[transName].histogram = histograms[enumeratedNames.index(transName)]
+        else:
+            channelISI.__dict__[transName].mirror = ISI.__dict__[transName].mirror
+            channelISI.__dict__[transName].histogram = np.flip(histograms[enumeratedNames.index(ISI.__dict__[transName].mirror)], axis=0) # Reflected about zero
+
+    return channelISI
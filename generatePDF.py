@@ -53,9 +53,11 @@ def generatePDF(simSettings: simulationSettings, simResults: simulationStatus):
 
 ###########################################################################
 # This function creates a probability distribution histogram based on the
-# classified ISI trajectories. It first combines all ISI trajectories
-# pertaining to the same main-cursor into a single array and then turns the 
-# trajectories into a histograms.
+# classified ISI trajectories. The trajectories of all transitions are
+# gathered into a single matrix, which is turned into the histograms of
+# every transition in one pass. ISI generated without keeping trajectories
+# already comes as histograms, while mirrored transitions are reflected from
+# the histogram of the transition they mirror.
 ###########################################################################
 def generateHist(simSettings: simulationSettings, simResults: simulationStatus):
 
@@ -66,14 +68,12 @@ def generateHist(simSettings: simulationSettings, simResults: simulationStatus):
     approximate    = simSettings.channel.approximate
     ISI = simResults.eyeGeneration.ISI
 
-    trajectories = nothing()
     PDF = nothing()
     PDF.initial = nothing()
     
     # Loop through each available channel file
     for chName in ISI.__dict__:
         setattr(PDF.initial, chName, nothing())
-        setattr(trajectories, chName, nothing())
 
         # Skip required channels
         if approximate:
@@ -83,39 +83,52 @@ def generateHist(simSettings: simulationSettings, simResults: simulationStatus):
             if chName in ['next', 'fext', 'xtalk']:
                 continue
         
-        # Combine trajectories into a single matrix
+        # Gather the trajectory matrices of all transitions into one
         transitions = ISI.__dict__[chName].__dict__
-        for transName in transitions:
-
-            cursorComb = list(ISI.__dict__[chName].__dict__[transName].__dict__)
+        transNames = [transName for transName in transitions if 'trajectories' in transitions[transName].__dict__]
+        histograms = np.zeros((len(transNames), len(yAxis), samplesPerSymb))
+        if transNames:
+            trajectories = np.concatenate([transitions[transName].trajectories for transName in transNames])
+            transitionIndex = np.repeat(np.arange(len(transNames)), [len(transitions[transName].trajectories) for transName in transNames])
 
-            # Prepare matrix to avoid dynamically resizing
-            trajectoryVectorLength = len(ISI.__dict__[chName].__dict__[transName].__dict__[cursorComb[0]].trajectory)
-            trajectories.__dict__[chName].__dict__[transName] = np.zeros((len(cursorComb), trajectoryVectorLength))
+            # Create transition-classified histograms from matrix in one pass
+            binTrajectories(histograms, trajectories, transitionIndex, yAxis, yIncrement)
 
-            for index, comb in enumerate(cursorComb):
-                trajectories.__dict__[chName].__dict__[transName][index, :] = ISI.__dict__[chName].__dict__[transName].__dict__[comb].trajectory      
-        
-        # Create transition-classified histogram from matrix
         for transName in transitions:
-
-            # Statically define matrix
-            PDF.initial.__dict__[chName].__dict__[transName] = np.zeros((len(yAxis), samplesPerSymb))
-
-            for count, index in enumerate(range(samplesPerSymb)):
-                # Not that in MATLAB the bins are defined by center-points, while in Python they are the edges.
-                yAxisLong = np.concatenate((yAxis, [yAxis[-1] + yIncrement])) - yIncrement/2 # add additional bin to remove clipping
-                if trajectories.__dict__[chName].__dict__[transName].ndim > 1:
-                    histogram, _ = np.histogram(trajectories.__dict__[chName].__dict__[transName][:,index], yAxisLong)
-                else:
-                    histogram, _ = np.histogram(trajectories.__dict__[chName].__dict__[transName][index], yAxisLong)
-                
-                PDF.initial.__dict__[chName].__dict__[transName][:, count] = histogram / len(transitions) # Normalize for all transitions
+            if transName in transNames:
+                histogram = histograms[transNames.index(transName)]
+            elif 'histogram' in transitions[transName].__dict__:
+                histogram = transitions[transName].histogram # ISI generated without keeping trajectories
+            else:
+                histogram = np.flip(histograms[transNames.index(transitions[transName].mirror)], axis=0) # Mirrored transition, reflected about zero
+            PDF.initial.__dict__[chName].__dict__[transName] = histogram / len(transitions) # Normalize for all transitions
                 
     # Save results
     simResults.eyeGeneration.PDF = PDF # reset previous PDF
 
 
+###########################################################################
+# This function adds trajectories to histograms of each transition, with
+# the same bins as generateHist (edges halfway between y-axis points, the
+# last edge included, values off the y-axis dropped). The histograms are
+# indexed as [transition, y-axis, sample] and transitionIndex gives the
+# transition of each trajectory.
+###########################################################################
+def binTrajectories(histograms: np.ndarray, trajectories: np.ndarray, transitionIndex: np.ndarray, yAxis: np.ndarray, yIncrement: float):
+
+    transitionCount, yAxisLength, samplesPerSymb = histograms.shape
+
+    # Find bins
+    yAxisLong = np.concatenate((yAxis, [yAxis[-1] + yIncrement])) - yIncrement/2
+    bins = np.searchsorted(yAxisLong, trajectories, side='right') - 1
+    bins[trajectories == yAxisLong[-1]] = yAxisLength - 1
+    inRange = (bins >= 0) & (bins < yAxisLength)
+
+    # Count trajectories of every transition, bin and sample in one pass
+    flatIndex = (transitionIndex[:, np.newaxis]*yAxisLength + bins)*samplesPerSymb + np.arange(samplesPerSymb)
+    histograms += np.bincount(flatIndex[inRange], minlength=transitionCount*yAxisLength*samplesPerSymb).reshape(histograms.shape)
+
+
 ###########################################################################
 # This function applies cross-talk to the probability distribution by
 # convolving each channel together vertically. The cross-talk channels
@@ -24,9 +24,25 @@
 
 from userSettingsObjects import simulationSettings, nothing
 from initializeSimulation import simulationStatus
+from generateVariableInfluence import createCTLE
+from tabulateCTLE import sectionResponses
+from runConcurrently import mapConcurrently
+from storePulseResponses import pulseStoreAddress, loadPulseResponses, savePulseResponses
 import numpy as np
 import control.matlab as ml
 import scipy.signal as spsig
+import scipy.fft as fft
+import functools
+
+CTLECacheSize = 64       # Number of CTLE impulse responses kept
+CTLESettlingTime = 40    # Length of CTLE impulse responses [time constants of slowest pole]
+
+class basisPulses:
+    def __init__(self, channel, CTLE, offset, length):
+        self.channel = channel # channel pulse response padded by a symbol sequence on each side
+        self.CTLE = CTLE       # the same after the CTLE
+        self.offset = offset   # start of the output for a symbol in the first position
+        self.length = length   # output length
 
 def generatePulseResponse(simSettings: simulationSettings, simResults: simulationStatus):
 
@@ -36,23 +52,40 @@ def generatePulseResponse(simSettings: simulationSettings, simResults: simulatio
     # Apply TX equalization
     applyTXEQ(simSettings, simResults)
 
-    # Apply channel characteristics
-    applyChannel(simSettings, simResults)
-    
-    # Apply RX gain
-    applyRXGain(simSettings, simResults)
-    
-    # Apply RX CTLE
-    applyRXCTLE(simSettings, simResults)
-    
-    # Apply RX FFE
-    applyRXFFE(simSettings, simResults)
+    # Load stored pulse responses if available
+    storeAddress = pulseStoreAddress(simSettings, simResults)
+    if loadPulseResponses(simSettings, simResults, storeAddress):
+        return
+
+    # Apply channel, RX gain, CTLE and FFE together in the frequency domain
+    if simSettings.general.pulseEngine == 'frequency':
+        applyLinearStages(simSettings, simResults)
+
+    # Apply channel, RX gain, CTLE and FFE by superposition of basis pulses
+    elif simSettings.general.pulseEngine == 'superposition':
+        applyTapSuperposition(simSettings, simResults)
+
+    else:
+        # Apply channel characteristics
+        applyChannel(simSettings, simResults)
+        
+        # Apply RX gain
+        applyRXGain(simSettings, simResults)
+        
+        # Apply RX CTLE
+        applyRXCTLE(simSettings, simResults)
+        
+        # Apply RX FFE
+        applyRXFFE(simSettings, simResults)
     
     # Apply RX DFE
     applyRXDFE(simSettings, simResults)
 
     # Limit length of pulse
     limitLength(simSettings, simResults)
+
+    # Store pulse responses for later runs
+    savePulseResponses(simResults, storeAddress)
     
 
 ###########################################################################
@@ -119,30 +152,14 @@ def applyTXEQ(simSettings: simulationSettings, simResults: simulationStatus):
         simResults.results.successful = successful
 
         # Order taps        
-        tapNames = list(taps.__dict__)
-        tapNames.sort()
-        response = [main]
-        pre = 1
-        post = 1
-        for tapName in tapNames:
-            tapValue = taps.__dict__[tapName].value
-            if tapName == ('pre' + str(pre)):
-                response.insert(0, tapValue)
-                pre = pre + 1
-            elif tapName == ('post' + str(post)):
-                response.append(tapValue)
-                post = post + 1
-
-        # Convolve input with response
-        discreteSignal = np.convolve(inputSignal, response)
-    else:
-        discreteSignal = inputSignal
-    
-    
+        response = orderTaps(taps)
+
     # Change signal to continuous time
-    outputSignal= np.zeros((samplesPerSymb*len(discreteSignal),))
-    for index in range(len(discreteSignal)):
-       outputSignal[index*samplesPerSymb:(index+1)*samplesPerSymb] = discreteSignal[index]
+    outputSignal = np.repeat(inputSignal, samplesPerSymb)
+
+    # Apply equalization
+    if addEqualization:
+        outputSignal = applyFIR(outputSignal, response, samplesPerSymb)
     
     
     # Save results
@@ -162,6 +179,7 @@ def applyChannel(simSettings: simulationSettings, simResults: simulationStatus):
         
     # Import variables
     samplesPerSymb   = simSettings.general.samplesPerSymb.value
+    workerCount      = int(simSettings.general.workerCount.value)
     approximate      = simSettings.channel.approximate
     inputSignal = simResults.pulseResponse.transmitter.output  
     channels    = simResults.influenceSources.channel
@@ -170,23 +188,19 @@ def applyChannel(simSettings: simulationSettings, simResults: simulationStatus):
     setattr(simResults.pulseResponse, 'channel', nothing())
     setattr(simResults.pulseResponse.channel, 'outputs', nothing())
     
-    # Loop through each channel
-    for chName in channels.__dict__:
-    
-        # Skip required channels
-        if approximate:
-            if chName not in ['thru', 'xtalk']:
-                continue
-        else:
-            if chName in ['next', 'fext', 'xtalk']:
-                continue
+    # Skip required channels
+    if approximate:
+        chNames = [chName for chName in channels.__dict__ if chName in ['thru', 'xtalk']]
+    else:
+        chNames = [chName for chName in channels.__dict__ if chName not in ['next', 'fext', 'xtalk']]
 
-        # Apply channel response
-        indecies = np.arange(0, len(inputSignal), samplesPerSymb).astype(int)
-        outputSignal = np.convolve(channels.__dict__[chName].pulseResponse, inputSignal[indecies],'same')
+    # Apply channel response to each channel (concurrently if desired)
+    indecies = np.arange(0, len(inputSignal), samplesPerSymb).astype(int)
+    outputSignals = mapConcurrently(lambda chName: np.convolve(channels.__dict__[chName].pulseResponse, inputSignal[indecies],'same'), chNames, workerCount)
 
-        # Save results
-        simResults.pulseResponse.channel.input = inputSignal
+    # Save results
+    simResults.pulseResponse.channel.input = inputSignal
+    for chName, outputSignal in zip(chNames, outputSignals):
         simResults.pulseResponse.channel.outputs.__dict__[chName] = outputSignal
 
 
@@ -207,22 +221,151 @@ def findPeakPulse(signal) -> int:
     return peakLoc
 
 
+###########################################################################
+# This function orders the names of FIR taps from the earliest pre-cursor
+# to the last post-cursor, stopping at the first missing tap on each side.
+###########################################################################
+def orderTapNames(taps) -> list:
+
+    tapNames = list(taps.__dict__)
+    tapNames.sort()
+    orderedNames = ['main']
+    pre = 1
+    post = 1
+    for tapName in tapNames:
+        if tapName == ('pre' + str(pre)):
+            orderedNames.insert(0, tapName)
+            pre = pre + 1
+        elif tapName == ('post' + str(post)):
+            orderedNames.append(tapName)
+            post = post + 1
+
+    return orderedNames
+
+
+###########################################################################
+# This function orders the values of FIR taps in the same way.
+###########################################################################
+def orderTaps(taps) -> list:
+
+    return [taps.__dict__[tapName].value for tapName in orderTapNames(taps)]
+
+
+###########################################################################
+# This function applies an FIR filter with taps one symbol apart, the first
+# of which is not delayed. The output is longer than the input by the span
+# of the taps. Signals can be given one per row to filter them together.
+# Each tap adds a scaled copy of the signals into the output at its delay,
+# using a single scratch array.
+###########################################################################
+def applyFIR(inputSignals: np.ndarray, taps: list, samplesPerSymb: int) -> np.ndarray:
+
+    length = np.shape(inputSignals)[-1]
+    outputSignals = np.zeros(np.shape(inputSignals)[:-1] + (length+(len(taps)-1)*samplesPerSymb,))
+    scaled = np.empty(np.shape(inputSignals))
+
+    for index, tap in enumerate(taps):
+        np.multiply(inputSignals, tap, out=scaled)
+        outputSignals[..., index*samplesPerSymb:index*samplesPerSymb+length] += scaled
+
+    return outputSignals
+
+
+###########################################################################
+# This function estimates the height of a signal as the sum of its cursors
+# around the peak. It is used to scale the signal to the receiver range.
+###########################################################################
+def measureCursorSum(simSettings: simulationSettings, signal: np.ndarray) -> float:
+
+    # Import variables
+    signalingMode   = simSettings.general.signalingMode
+    samplesPerSymb  = simSettings.general.samplesPerSymb.value
+    preCursorCount  = simSettings.transmitter.preCursorCount.value
+    postCursorCount = simSettings.transmitter.postCursorCount.value
+
+    peakLoc = findPeakPulse(abs(signal))
+
+    if signalingMode == '1+D':
+        startIdx = round(peakLoc-(preCursorCount+0.5)*samplesPerSymb)
+        endIdx = round(peakLoc+(postCursorCount-0.5)*samplesPerSymb)
+    elif signalingMode == '1+0.5D':
+        startIdx = round(peakLoc-(preCursorCount+1/6)*samplesPerSymb)
+        endIdx = round(peakLoc+(postCursorCount-1/6)*samplesPerSymb)
+    else:
+        startIdx = round(peakLoc-preCursorCount*samplesPerSymb)
+        endIdx = round(peakLoc+postCursorCount*samplesPerSymb)
+    
+    startIdx = max(round(startIdx),1)
+    endIdx = min(round(endIdx),len(signal))
+    section = np.arange(startIdx, endIdx, samplesPerSymb)
+    cursorSum = np.sum(abs(signal[section]))
+
+    return cursorSum
+
+
+###########################################################################
+# This function sets the RX gain so the thru channel's cursors add up to
+# the output range of the receiver.
+###########################################################################
+def adaptRXGain(simSettings: simulationSettings, simResults: simulationStatus, thruSignal: np.ndarray):
+
+    # Import variables
+    gain       = simSettings.receiver.preAmp.gain
+    distortion = simResults.influenceSources.totalDistortion.output
+
+    # Estimate signal height
+    cursorSum = measureCursorSum(simSettings, thruSignal)
+
+    # Calculate required gain
+    saturation = max(abs(distortion))
+    gain.value = saturation/cursorSum
+    gain.value = round(gain.value/gain.increment)*gain.increment # round to closest multiple of increment
+    gain.value = max(min(gain.value,gain.maxValue), gain.minValue) # keep within limits
+
+    # Update current adaption setting
+    simSettings.receiver.preAmp.gain.value = gain.value
+    if 'adaption' in simResults.__dict__:
+        simResults.adaption.currentResult.knobs.__dict__['receiver_preAmp_gain'] = gain.value
+        print('receiver_preAmp_gain: {0:.2f}'.format(gain.value))
+
+
+###########################################################################
+# This function sets the RX FFE main tap so the thru channel's cursors add
+# up to the output range of the receiver.
+###########################################################################
+def adaptFFEMain(simSettings: simulationSettings, simResults: simulationStatus, thruSignal: np.ndarray):
+
+    # Import variables
+    taps       = simSettings.receiver.FFE.taps
+    distortion = simResults.influenceSources.totalDistortion.output
+
+    # Estimate signal height
+    cursorSum = measureCursorSum(simSettings, thruSignal)
+
+    # Calculate required gain
+    saturation = max(abs(distortion))
+    taps.main.value = saturation/cursorSum
+    taps.main.value = round(taps.main.value/taps.main.increment)*taps.main.increment # round to closest multiple of increment
+    taps.main.value = max(min(taps.main.value,taps.main.maxValue),taps.main.minValue) # keep within limits
+
+    # Update current adaption setting
+    simSettings.receiver.FFE.taps.main.value = taps.main.value
+    if 'adaption' in simResults.__dict__:
+        simResults.adaption.currentResult.knobs.__dict__['receiver_FFE_taps_main'] = taps.main.value
+        print('receiver_FFE_taps_main: {0:.2f}\n'.format(taps.main.value))
+
+
 ###########################################################################
 # This function increases the gain of the received signal by a constant.
 ###########################################################################
 def applyRXGain(simSettings: simulationSettings, simResults: simulationStatus):
     
     # Import variables
-    signalingMode   = simSettings.general.signalingMode
-    samplesPerSymb  = simSettings.general.samplesPerSymb.value
     adapt           = simSettings.adaption.adapt
     knobs           = simSettings.adaption.knobs
-    preCursorCount  = simSettings.transmitter.preCursorCount.value
-    postCursorCount = simSettings.transmitter.postCursorCount.value
     approximate     = simSettings.channel.approximate
     addGain         = simSettings.receiver.preAmp.addGain
     gain            = simSettings.receiver.preAmp.gain
-    distortion   = simResults.influenceSources.totalDistortion.output
     inputSignals = simResults.pulseResponse.channel.outputs
 
     # Needed for output
@@ -234,36 +377,7 @@ def applyRXGain(simSettings: simulationSettings, simResults: simulationStatus):
     # Calculate gain automatically
     if addGain and adapt and 'receiver.preAmp.gain' in knobs:
         
-        # Estimate signal height
-        peakLoc = findPeakPulse(abs(inputSignals.thru))
-
-        if signalingMode == '1+D':
-            startIdx = round(peakLoc-(preCursorCount+0.5)*samplesPerSymb)
-            endIdx = round(peakLoc+(postCursorCount-0.5)*samplesPerSymb)
-        elif signalingMode == '1+0.5D':
-            startIdx = round(peakLoc-(preCursorCount+1/6)*samplesPerSymb)
-            endIdx = round(peakLoc+(postCursorCount-1/6)*samplesPerSymb)
-        else:
-            startIdx = round(peakLoc-preCursorCount*samplesPerSymb)
-            endIdx = round(peakLoc+postCursorCount*samplesPerSymb)
-        
-        startIdx = max(round(startIdx),1)
-        endIdx = min(round(endIdx),len(inputSignals.thru))
-        section = np.arange(startIdx, endIdx, samplesPerSymb)
-        cursorSum = np.sum(abs(inputSignals.thru[section]))
-
-        # Calculate required gain
-        saturation = max(abs(distortion))
-        gain.value = saturation/cursorSum
-        gain.value = round(gain.value/gain.increment)*gain.increment # round to closest multiple of increment
-        gain.value = max(min(gain.value,gain.maxValue), gain.minValue) # keep within limits
-
-        # Update current adaption setting
-        simSettings.receiver.preAmp.gain.value = gain.value
-        if 'adaption' in simResults.__dict__:
-            simResults.adaption.currentResult.knobs.__dict__['receiver_preAmp_gain'] = gain.value
-            print('receiver_preAmp_gain: {0:.2f}'.format(gain.value))
-        
+        adaptRXGain(simSettings, simResults, inputSignals.thru)
         
     # Remove gain
     elif not addGain:
@@ -304,13 +418,15 @@ def applyRXCTLE(simSettings: simulationSettings, simResults: simulationStatus):
 
     # Import variables
     samplePeriod    = simSettings.general.samplePeriod.value
+    workerCount     = int(simSettings.general.workerCount.value)
     approximate     = simSettings.channel.approximate
     addEqualization = simSettings.receiver.CTLE.addEqualization
     zeroFreq        = simSettings.receiver.CTLE.zeroFreq.value
+    zeroNumb        = simSettings.receiver.CTLE.zeroNumb.value
     pole1Freq       = simSettings.receiver.CTLE.pole1Freq.value
-    zeroName     = ('z' + str(zeroFreq/1e9)).replace('.', '_')
-    poleName     = ('z' + str(pole1Freq/1e9)).replace('.', '_')
-    transferFunc = simResults.influenceSources.RXCTLE.__dict__[zeroName].__dict__[poleName].transferFunc
+    pole1Numb       = simSettings.receiver.CTLE.pole1Numb.value
+    pole2Freq       = simSettings.receiver.CTLE.pole2Freq.value
+    pole2Numb       = simSettings.receiver.CTLE.pole2Numb.value
     inputSignals = simResults.pulseResponse.receiver.preAmp.outputs
     
     # Needed for outputs
@@ -318,31 +434,52 @@ def applyRXCTLE(simSettings: simulationSettings, simResults: simulationStatus):
     setattr(simResults.pulseResponse.receiver.CTLE, 'inputs', nothing())
     setattr(simResults.pulseResponse.receiver.CTLE, 'outputs', nothing())
 
-    # Loop through each channel
-    for chName in inputSignals.__dict__:
-        
-        # Skip required channels
-        if approximate:
-            if chName not in ['thru', 'xtalk']:
-                continue
-        else:
-            if chName in ['next', 'fext', 'xtalk']:
-                continue
-        
-        # Apply CTLE
-        inputSignal = inputSignals.__dict__[chName]
-        if addEqualization:
-            times = np.arange(len(inputSignals.__dict__[chName]))*samplePeriod
-            outputSignal, times, _ = ml.lsim(transferFunc, inputSignal, times)
-        else:
-            outputSignal = inputSignal
-        
-        
-        # Save results
-        simResults.pulseResponse.receiver.CTLE.inputs.__dict__[chName] = inputSignal
+    # Retrieve discrete impulse response (only simulated for new settings)
+    if addEqualization:
+        impulseResponse = CTLEImpulseResponse(zeroFreq, zeroNumb, pole1Freq, pole1Numb, pole2Freq, pole2Numb, samplePeriod)
+
+    # Skip required channels
+    if approximate:
+        chNames = [chName for chName in inputSignals.__dict__ if chName in ['thru', 'xtalk']]
+    else:
+        chNames = [chName for chName in inputSignals.__dict__ if chName not in ['next', 'fext', 'xtalk']]
+
+    # Apply CTLE to each channel (concurrently if desired)
+    if addEqualization:
+        outputSignals = mapConcurrently(lambda chName: spsig.oaconvolve(inputSignals.__dict__[chName], impulseResponse)[:len(inputSignals.__dict__[chName])], chNames, workerCount)
+    else:
+        outputSignals = [inputSignals.__dict__[chName] for chName in chNames]
+    
+    # Save results
+    for chName, outputSignal in zip(chNames, outputSignals):
+        simResults.pulseResponse.receiver.CTLE.inputs.__dict__[chName] = inputSignals.__dict__[chName]
         simResults.pulseResponse.receiver.CTLE.outputs.__dict__[chName] = outputSignal
     
 
+###########################################################################
+# This function returns the discrete impulse response of the CTLE for the
+# given sample period. It is the response simulated by lsim, which
+# interpolates linearly between samples, to a unit sample and lasts until
+# the slowest pole has settled. Recently used responses are kept, so
+# returning to earlier CTLE settings does not require simulating again.
+###########################################################################
+@functools.lru_cache(maxsize=CTLECacheSize)
+def CTLEImpulseResponse(zeroFreq: float, zeroNumb: int, pole1Freq: float, pole1Numb: int, pole2Freq: float, pole2Numb: int, samplePeriod: float) -> np.ndarray:
+
+    transferFunc = createCTLE(zeroFreq, zeroNumb, pole1Freq, pole1Numb, pole2Freq, pole2Numb)
+
+    # Unit sample one period in, so it is interpolated from both sides as in a signal
+    length = int(np.ceil(CTLESettlingTime/(2*np.pi*min(pole1Freq, pole2Freq)*samplePeriod))) + 2
+    unitSample = np.zeros((length,))
+    unitSample[1] = 1
+    times = np.arange(length)*samplePeriod
+    response, _, _ = ml.lsim(transferFunc, unitSample, times)
+
+    impulseResponse = np.array(response)[1:]
+    impulseResponse.flags.writeable = False # Shared by all callers
+
+    return impulseResponse
+
 
 ###########################################################################
 # This function convolves the RX FFE equalization response with the pulse 
@@ -352,16 +489,12 @@ def applyRXCTLE(simSettings: simulationSettings, simResults: simulationStatus):
 def applyRXFFE(simSettings: simulationSettings, simResults: simulationStatus):
     
     # Import variables
-    signalingMode   = simSettings.general.signalingMode
     samplesPerSymb  = simSettings.general.samplesPerSymb.value
     adapt           = simSettings.adaption.adapt
     knobs           = simSettings.adaption.knobs
-    preCursorCount  = simSettings.transmitter.preCursorCount.value
-    postCursorCount = simSettings.transmitter.postCursorCount.value
     approximate     = simSettings.channel.approximate
     taps            = simSettings.receiver.FFE.taps
     addEqualization = simSettings.receiver.FFE.addEqualization
-    distortion   = simResults.influenceSources.totalDistortion.output
     inputSignals = simResults.pulseResponse.receiver.CTLE.outputs
 
     if addEqualization:
@@ -369,74 +502,27 @@ def applyRXFFE(simSettings: simulationSettings, simResults: simulationStatus):
         # Automatically calculate main-tap value
         if adapt and ('receiver.FFE.taps.main' in knobs):
 
-            # Estimate signal height
-            peakLoc = findPeakPulse(abs(inputSignals.thru))
-
-            if signalingMode == '1+D':
-                startIdx = round(peakLoc-(preCursorCount+0.5)*samplesPerSymb)
-                endIdx = round(peakLoc+(postCursorCount-0.5)*samplesPerSymb)
-            elif signalingMode == '1+0.5D':
-                startIdx = round(peakLoc-(preCursorCount+1/6)*samplesPerSymb)
-                endIdx = round(peakLoc+(postCursorCount-1/6)*samplesPerSymb)
-            else:
-                startIdx = round(peakLoc-preCursorCount*samplesPerSymb)
-                endIdx = round(peakLoc+postCursorCount*samplesPerSymb)
-            
-            startIdx = max(round(startIdx),1)
-            endIdx = min(round(endIdx),len(inputSignals.thru))
-            section = np.arange(startIdx, endIdx, samplesPerSymb)
-            cursorSum = np.sum(abs(inputSignals.thru[section]))
-
-            # Calculate required gain
-            saturation = max(abs(distortion))
-            taps.main.value = saturation/cursorSum
-            taps.main.value = round(taps.main.value/taps.main.increment)*taps.main.increment # round to closest multiple of increment
-            taps.main.value = max(min(taps.main.value,taps.main.maxValue),taps.main.minValue) # keep within limits
-
-            # Update current adaption setting
-            simSettings.receiver.FFE.taps.main.value = taps.main.value
-            if 'adaption' in simResults.__dict__:
-                simResults.adaption.currentResult.knobs.__dict__['receiver_FFE_taps_main'] = taps.main.value
-                print('receiver_FFE_taps_main: {0:.2f}\n'.format(taps.main.value))
-            
-        
+            adaptFFEMain(simSettings, simResults, inputSignals.thru)
 
         # Order taps
-        tapNames = list(taps.__dict__)
-        tapNames.sort()
-        response = [taps.main.value]
-        pre = 1
-        post = 1
-        for tapName in tapNames:
-            if tapName == ('pre' + str(pre)):
-                response.insert(0, taps.__dict__[tapName].value)
-                pre = pre + 1
-            elif tapName == ('post' + str(post)):
-                response.append(taps.__dict__[tapName].value)
-                post = post + 1
-            
-        
+        response = orderTaps(taps)
+        response = response + [0]*(len(taps.__dict__)-len(response)) # Output covers every tap given
 
-        # Perform equalization on each channel
+        # Skip required channels
+        if approximate:
+            chNames = [chName for chName in inputSignals.__dict__ if chName in ['thru', 'xtalk']]
+        else:
+            chNames = [chName for chName in inputSignals.__dict__ if chName not in ['next', 'fext', 'xtalk']]
+
+        # Perform equalization on channels of the same length together
+        equalized = {}
+        for length in {len(inputSignals.__dict__[chName]) for chName in chNames}:
+            names = [chName for chName in chNames if len(inputSignals.__dict__[chName]) == length]
+            equalized.update(zip(names, applyFIR(np.array([inputSignals.__dict__[chName] for chName in names]), response, samplesPerSymb)))
+        
         outputSignals = nothing()
-        for chName in inputSignals.__dict__:
-            inputSignals.__dict__[chName] = inputSignals.__dict__[chName] # This is likely redundant
-
-            # Skip required channels
-            if approximate:
-                if chName not in ['thru', 'xtalk']:
-                    continue
-            else:
-                if chName in ['next', 'fext', 'xtalk']:
-                    continue
-
-            # Convolve signal with equalizer (why wasn't 'convole' used here? Will keep as it was for now)
-            symbol = 1
-            numbCursors = len(tapNames)
-            outputSignals.__dict__[chName] = np.zeros((len(inputSignals.__dict__[chName])+(numbCursors-1)*samplesPerSymb,))
-            for index in range(len(response)):
-                outputSignals.__dict__[chName] = outputSignals.__dict__[chName] + response[index] * np.concatenate((np.zeros(((symbol-1)*samplesPerSymb,)), inputSignals.__dict__[chName], np.zeros(((numbCursors-symbol)*samplesPerSymb),)))
-                symbol = symbol+1
+        for chName in chNames:
+            outputSignals.__dict__[chName] = equalized[chName]
         
     else:
         outputSignals = inputSignals
@@ -450,6 +536,432 @@ def applyRXFFE(simSettings: simulationSettings, simResults: simulationStatus):
     simResults.pulseResponse.receiver.FFE.outputs = outputSignals
 
 
+###########################################################################
+# This function applies the channel, RX gain, CTLE and FFE in one step.
+# All of these stages are linear and time invariant, so their frequency
+# responses are multiplied together and each channel needs only a single
+# inverse FFT, instead of a convolution, a CTLE simulation and a sum of
+# shifted copies. The spectra of the channel pulse responses do not change
+# during a simulation and are kept with the channels. The thru signal part
+# way along the chain is only formed when the RX gain or FFE main tap is
+# calculated automatically, or when the pulse response is plotted.
+###########################################################################
+def applyLinearStages(simSettings: simulationSettings, simResults: simulationStatus):
+
+    # Import variables
+    samplesPerSymb  = simSettings.general.samplesPerSymb.value
+    samplePeriod    = simSettings.general.samplePeriod.value
+    plotPulse       = simSettings.general.plotting.pulseResponse
+    adapt           = simSettings.adaption.adapt
+    knobs           = simSettings.adaption.knobs
+    workerCount     = int(simSettings.general.workerCount.value)
+    approximate     = simSettings.channel.approximate
+    addGain         = simSettings.receiver.preAmp.addGain
+    gain            = simSettings.receiver.preAmp.gain
+    CTLESettings    = simSettings.receiver.CTLE
+    addFFE          = simSettings.receiver.FFE.addEqualization
+    taps            = simSettings.receiver.FFE.taps
+    inputSignal = simResults.pulseResponse.transmitter.output
+    channels    = simResults.influenceSources.channel
+
+    # Needed for output
+    setattr(simResults.pulseResponse, 'channel', nothing())
+    setattr(simResults.pulseResponse.channel, 'outputs', nothing())
+    setattr(simResults.pulseResponse.receiver, 'FFE', nothing())
+    setattr(simResults.pulseResponse.receiver.FFE, 'outputs', nothing())
+
+    # Skip required channels
+    if approximate:
+        chNames = [chName for chName in channels.__dict__ if chName in ['thru', 'xtalk']]
+    else:
+        chNames = [chName for chName in channels.__dict__ if chName not in ['next', 'fext', 'xtalk']]
+
+    # Transmitted symbols, applied to the channels as in applyChannel
+    symbols = inputSignal[np.arange(0, len(inputSignal), samplesPerSymb).astype(int)]
+
+    longest = max(len(channels.__dict__[chName].pulseResponse) for chName in chNames)
+    fftLength, extension = linearStageLength(simSettings, longest, len(symbols))
+    freqs = fft.rfftfreq(fftLength, samplePeriod)
+
+    # Channel outputs start where a 'same' convolution with the symbols would
+    spectra = {}
+    starts = {}
+    for chName in chNames:
+        length = len(channels.__dict__[chName].pulseResponse)
+        spectra[chName] = channelSpectrum(channels.__dict__[chName], fftLength) * fft.rfft(symbols, fftLength)
+        starts[chName] = (min(length, len(symbols))-1)//2
+    
+    thruLength = len(channels.thru.pulseResponse)
+    if plotPulse or (addGain and adapt and 'receiver.preAmp.gain' in knobs):
+        simResults.pulseResponse.channel.outputs.thru = fft.irfft(spectra['thru'], fftLength)[starts['thru']:starts['thru']+thruLength]
+    
+    # Apply RX gain
+    if addGain and adapt and 'receiver.preAmp.gain' in knobs:
+        adaptRXGain(simSettings, simResults, simResults.pulseResponse.channel.outputs.thru)
+    elif not addGain:
+        gain.value = 1
+    response = gain.value * np.ones((len(freqs),))
+
+    # Apply RX CTLE
+    if CTLESettings.addEqualization:
+        response = response * evaluateCTLE(simSettings, freqs)
+
+    # Apply RX FFE
+    if addFFE:
+        if adapt and ('receiver.FFE.taps.main' in knobs):
+            CTLEOutput = fft.irfft(spectra['thru']*response, fftLength)[starts['thru']:starts['thru']+thruLength]
+            adaptFFEMain(simSettings, simResults, CTLEOutput)
+
+        # Taps are one symbol apart, the first is not delayed
+        delay = np.exp(-2j*np.pi*freqs*samplesPerSymb*samplePeriod)
+        response = response * np.polyval(orderTaps(taps)[::-1], delay)
+
+    # Form outputs (concurrently if desired)
+    def formOutput(chName):
+        length = len(channels.__dict__[chName].pulseResponse)
+        return fft.irfft(spectra[chName]*response, fftLength)[starts[chName]:starts[chName]+length+extension]
+
+    for chName, outputSignal in zip(chNames, mapConcurrently(formOutput, chNames, workerCount)):
+        simResults.pulseResponse.receiver.FFE.outputs.__dict__[chName] = outputSignal
+
+    # Save results
+    simResults.pulseResponse.channel.input = inputSignal
+
+
+###########################################################################
+# This function returns the FFT length needed to apply the linear stages to
+# the given lengths of channel pulse response and symbol sequence without
+# wrapping around, along with the length the FFE adds to its input.
+###########################################################################
+def linearStageLength(simSettings: simulationSettings, pulseLength: int, symbolCount: int):
+
+    # Import variables
+    samplesPerSymb  = simSettings.general.samplesPerSymb.value
+    samplePeriod    = simSettings.general.samplePeriod.value
+    CTLESettings    = simSettings.receiver.CTLE
+    addFFE          = simSettings.receiver.FFE.addEqualization
+    taps            = simSettings.receiver.FFE.taps
+
+    # Length of the FFE output beyond its input
+    if addFFE:
+        extension = (len(taps.__dict__)-1)*samplesPerSymb
+    else:
+        extension = 0
+    
+    # Time for the CTLE to settle, for the slowest pole allowed, to avoid wrapping around
+    if CTLESettings.addEqualization:
+        slowestPole = min(CTLESettings.pole1Freq.minValue, CTLESettings.pole2Freq.minValue)
+        settling = int(np.ceil(10/(2*np.pi*slowestPole*samplePeriod)))
+    else:
+        settling = 0
+
+    fftLength = fft.next_fast_len(pulseLength+symbolCount-1+extension+settling, real=True)
+
+    return fftLength, extension
+
+
+###########################################################################
+# This function returns the spectrum of a channel's pulse response for the
+# given FFT length, it is only calculated again if the length changes.
+###########################################################################
+def channelSpectrum(channel, fftLength: int) -> np.ndarray:
+
+    if getattr(channel, 'pulseSpectrumLength', None) != fftLength:
+        channel.pulseSpectrum = fft.rfft(channel.pulseResponse, fftLength)
+        channel.pulseSpectrumLength = fftLength
+
+    return channel.pulseSpectrum
+
+
+###########################################################################
+# This function evaluates the CTLE transfer function at the given
+# frequencies. It is the same zero-pole-gain model created by
+# generateCTLE, which has unity gain at DC.
+###########################################################################
+def evaluateCTLE(simSettings: simulationSettings, freqs: np.ndarray) -> np.ndarray:
+
+    # Import variables
+    zeroFreq  = simSettings.receiver.CTLE.zeroFreq.value
+    zeroNumb  = simSettings.receiver.CTLE.zeroNumb.value
+    pole1Freq = simSettings.receiver.CTLE.pole1Freq.value
+    pole1Numb = simSettings.receiver.CTLE.pole1Numb.value
+    pole2Freq = simSettings.receiver.CTLE.pole2Freq.value
+    pole2Numb = simSettings.receiver.CTLE.pole2Numb.value
+
+    response = (1 + 1j*freqs/zeroFreq) ** zeroNumb
+    response = response / (1 + 1j*freqs/pole1Freq) ** pole1Numb
+    response = response / (1 + 1j*freqs/pole2Freq) ** pole2Numb
+
+    return response
+
+
+###########################################################################
+# This function applies the channel, RX gain, CTLE and FFE by linear
+# superposition. The responses of the channel and CTLE to a symbol in each
+# position of the transmitted sequence are kept as basis pulses, which are
+# only formed again when the CTLE settings change. The CTLE output is a sum
+# of the basis pulses weighted by the equalized TX symbols and RX gain, and
+# the FFE output a weighted sum of shifted copies of it. Candidates that
+# only change the TX or FFE taps or the gain do not repeat the channel or
+# CTLE stages.
+###########################################################################
+def applyTapSuperposition(simSettings: simulationSettings, simResults: simulationStatus):
+
+    # Import variables
+    samplesPerSymb  = simSettings.general.samplesPerSymb.value
+    plotPulse       = simSettings.general.plotting.pulseResponse
+    adapt           = simSettings.adaption.adapt
+    knobs           = simSettings.adaption.knobs
+    addGain         = simSettings.receiver.preAmp.addGain
+    gain            = simSettings.receiver.preAmp.gain
+    addFFE          = simSettings.receiver.FFE.addEqualization
+    taps            = simSettings.receiver.FFE.taps
+    inputSignal = simResults.pulseResponse.transmitter.output
+
+    # Needed for output
+    setattr(simResults.pulseResponse, 'channel', nothing())
+    setattr(simResults.pulseResponse.channel, 'outputs', nothing())
+    setattr(simResults.pulseResponse.receiver, 'FFE', nothing())
+    setattr(simResults.pulseResponse.receiver.FFE, 'outputs', nothing())
+
+    # Transmitted symbols, applied to the channels as in applyChannel
+    symbols = inputSignal[np.arange(0, len(inputSignal), samplesPerSymb).astype(int)]
+    positions = np.nonzero(symbols)[0]
+
+    bases = tapBasis(simSettings, simResults, len(symbols))
+
+    # Apply channel to thru signal, only if it is needed
+    if plotPulse or (addGain and adapt and 'receiver.preAmp.gain' in knobs):
+        simResults.pulseResponse.channel.outputs.thru = superimpose(bases['thru'].channel, symbols, positions, bases['thru'].offset, bases['thru'].length)
+
+    # Apply RX gain
+    if addGain and adapt and 'receiver.preAmp.gain' in knobs:
+        adaptRXGain(simSettings, simResults, simResults.pulseResponse.channel.outputs.thru)
+    elif not addGain:
+        gain.value = 1
+
+    # Apply RX CTLE
+    CTLEOutputs = {}
+    for chName in bases:
+        CTLEOutputs[chName] = gain.value * superimpose(bases[chName].CTLE, symbols, positions, bases[chName].offset, bases[chName].length)
+
+    # Apply RX FFE as shifted copies one symbol apart
+    if addFFE:
+        if adapt and ('receiver.FFE.taps.main' in knobs):
+            adaptFFEMain(simSettings, simResults, CTLEOutputs['thru'])
+
+        response = orderTaps(taps)
+        response = response + [0]*(len(taps.__dict__)-len(response)) # Output covers every tap given
+        for chName in CTLEOutputs:
+            simResults.pulseResponse.receiver.FFE.outputs.__dict__[chName] = applyFIR(CTLEOutputs[chName], response, samplesPerSymb)
+    else:
+        for chName in CTLEOutputs:
+            simResults.pulseResponse.receiver.FFE.outputs.__dict__[chName] = CTLEOutputs[chName]
+
+    # Save results
+    simResults.pulseResponse.channel.input = simResults.pulseResponse.transmitter.output
+
+
+###########################################################################
+# This function returns the basis pulses of every channel for a sequence
+# of the given number of symbols. They are kept with the fixed influences
+# and only formed again if the CTLE settings or sequence length change.
+# Rather than one pulse per symbol position, the padded channel pulse
+# response is kept and each position is a slice of it.
+###########################################################################
+def tapBasis(simSettings: simulationSettings, simResults: simulationStatus, symbolCount: int) -> dict:
+
+    # Import variables
+    samplePeriod    = simSettings.general.samplePeriod.value
+    workerCount     = int(simSettings.general.workerCount.value)
+    approximate     = simSettings.channel.approximate
+    addEqualization = simSettings.receiver.CTLE.addEqualization
+    zeroFreq        = simSettings.receiver.CTLE.zeroFreq.value
+    zeroNumb        = simSettings.receiver.CTLE.zeroNumb.value
+    pole1Freq       = simSettings.receiver.CTLE.pole1Freq.value
+    pole1Numb       = simSettings.receiver.CTLE.pole1Numb.value
+    pole2Freq       = simSettings.receiver.CTLE.pole2Freq.value
+    pole2Numb       = simSettings.receiver.CTLE.pole2Numb.value
+    channels = simResults.influenceSources.channel
+
+    if addEqualization:
+        key = (zeroFreq, zeroNumb, pole1Freq, pole1Numb, pole2Freq, pole2Numb, symbolCount)
+    else:
+        key = (symbolCount,)
+
+    # Return kept basis if still valid
+    if getattr(simResults.influenceSources, 'tapBasisKey', None) == key:
+        return simResults.influenceSources.tapBasis
+
+    # Skip required channels
+    if approximate:
+        chNames = [chName for chName in channels.__dict__ if chName in ['thru', 'xtalk']]
+    else:
+        chNames = [chName for chName in channels.__dict__ if chName not in ['next', 'fext', 'xtalk']]
+
+    if addEqualization:
+        impulseResponse = CTLEImpulseResponse(zeroFreq, zeroNumb, pole1Freq, pole1Numb, pole2Freq, pole2Numb, samplePeriod)
+
+    bases = {}
+    for chName in chNames:
+        pulse = channels.__dict__[chName].pulseResponse
+        padded = np.concatenate((np.zeros((symbolCount,)), pulse, np.zeros((symbolCount,))))
+        if addEqualization:
+            filtered = spsig.oaconvolve(padded, impulseResponse)[:len(padded)]
+        else:
+            filtered = padded
+
+        # Same alignment as a 'same' convolution with the symbols
+        offset = symbolCount + (min(len(pulse), symbolCount)-1)//2
+        bases[chName] = basisPulses(padded, filtered, offset, max(len(pulse), symbolCount))
+
+    # Save results
+    simResults.influenceSources.tapBasis = bases
+    simResults.influenceSources.tapBasisKey = key
+
+    return bases
+
+
+###########################################################################
+# This function sums the basis pulses of the given symbol positions,
+# weighted by their symbols.
+###########################################################################
+def superimpose(padded: np.ndarray, symbols: np.ndarray, positions: np.ndarray, offset: int, length: int) -> np.ndarray:
+
+    outputSignal = np.zeros((length,))
+    for position in positions:
+        outputSignal += symbols[position] * padded[offset-position:offset-position+length]
+
+    return outputSignal
+
+
+###########################################################################
+# This function generates the pulse responses of many candidate settings
+# at once, as an optimizer would evaluate them. Each row of the candidates
+# matrix holds the values of the given knobs (named as in adaption.knobs),
+# knobs not given keep their current setting. The TX equalization, channel,
+# RX gain, CTLE and FFE are applied in the frequency domain as in the
+# 'frequency' engine, for all candidates together. CTLE responses are
+# combined from the first-order sections of every corner frequency used.
+# The DFE and length limit are then applied to each candidate.
+#
+# The settings and results are not changed. The RX gain and FFE main tap
+# are used as given, they are not calculated automatically even if they
+# are adapted knobs. The channels must already have been generated.
+#
+# Returns the pulse responses of each channel as arrays of one row per
+# candidate, and whether the TX taps of each candidate are valid.
+###########################################################################
+def generatePulseBatch(simSettings: simulationSettings, simResults: simulationStatus, knobs: list, candidates: np.ndarray):
+
+    # Import variables
+    samplesPerSymb  = simSettings.general.samplesPerSymb.value
+    samplePeriod    = simSettings.general.samplePeriod.value
+    approximate     = simSettings.channel.approximate
+    pulseVoltage    = simSettings.transmitter.signalAmplitude.value
+    preCursorCount  = simSettings.transmitter.preCursorCount.value
+    postCursorCount = simSettings.transmitter.postCursorCount.value
+    includeSourceImpedance = simSettings.transmitter.includeSourceImpedance
+    TXEQ            = simSettings.transmitter.EQ
+    addGain         = simSettings.receiver.preAmp.addGain
+    addCTLE         = simSettings.receiver.CTLE.addEqualization
+    FFE             = simSettings.receiver.FFE
+    DFE             = simSettings.receiver.DFE
+    channels        = simResults.influenceSources.channel
+
+    # Check candidates
+    candidates = np.atleast_2d(np.asarray(candidates, dtype=float))
+    if candidates.shape[1] != len(knobs):
+        raise ValueError('candidates must have one column per knob')
+    for knob in knobs:
+        if not (knob.startswith(('transmitter.EQ.taps.', 'receiver.FFE.taps.', 'receiver.DFE.taps.', 'receiver.CTLE.')) or knob == 'receiver.preAmp.gain'):
+            raise ValueError('knob {0:s} can not be batched'.format(knob))
+    candidateCount = candidates.shape[0]
+
+    # Values of a knob for every candidate
+    def knobValues(knob):
+        if knob in knobs:
+            return candidates[:, knobs.index(knob)]
+        return np.full((candidateCount,), float(functools.reduce(getattr, knob.split('.'), simSettings).value))
+
+    # Skip required channels
+    if approximate:
+        chNames = [chName for chName in channels.__dict__ if chName in ['thru', 'xtalk']]
+    else:
+        chNames = [chName for chName in channels.__dict__ if chName not in ['next', 'fext', 'xtalk']]
+
+    # Transmitted symbols of every candidate, as formed by applyPulse and applyTXEQ
+    if includeSourceImpedance:
+        pulseVoltage = pulseVoltage/2
+    successful = np.ones((candidateCount,), dtype=bool)
+    if TXEQ.addEqualization:
+        TXNames = orderTapNames(TXEQ.taps)
+        TXTaps = np.column_stack([knobValues('transmitter.EQ.taps.'+tapName) for tapName in TXNames])
+
+        # Main tap fills up the supply and must be the largest
+        others = [index for index, tapName in enumerate(TXNames) if tapName != 'main']
+        main = 1 - np.sum(np.abs(TXTaps[:, others]), axis=1)
+        TXTaps[:, TXNames.index('main')] = main
+        successful = (main > 0) & np.all(np.abs(TXTaps[:, others]) < np.abs(main)[:, np.newaxis], axis=1)
+    else:
+        TXTaps = np.ones((candidateCount, 1))
+    symbols = np.zeros((candidateCount, preCursorCount+postCursorCount+TXTaps.shape[1]))
+    symbols[:, preCursorCount:preCursorCount+TXTaps.shape[1]] = pulseVoltage*TXTaps
+
+    longest = max(len(channels.__dict__[chName].pulseResponse) for chName in chNames)
+    fftLength, extension = linearStageLength(simSettings, longest, symbols.shape[1])
+    freqs = fft.rfftfreq(fftLength, samplePeriod)
+    response = fft.rfft(symbols, fftLength, axis=1)
+
+    # Apply RX gain
+    if addGain:
+        response = response * knobValues('receiver.preAmp.gain')[:, np.newaxis]
+
+    # Apply RX CTLE
+    if addCTLE:
+        cornerFreqs = [knobValues('receiver.CTLE.'+name) for name in ['zeroFreq', 'pole1Freq', 'pole2Freq']]
+        powers = [knobValues('receiver.CTLE.zeroNumb'), -knobValues('receiver.CTLE.pole1Numb'), -knobValues('receiver.CTLE.pole2Numb')]
+        lattice, indices = np.unique(np.concatenate(cornerFreqs), return_inverse=True)
+        sections = sectionResponses(lattice, freqs)
+        exponent = np.zeros((candidateCount, len(freqs)), dtype=complex)
+        for index in range(3):
+            section = indices[index*candidateCount:(index+1)*candidateCount]
+            exponent = exponent + powers[index][:, np.newaxis] * (sections[0][section] + 1j*sections[1][section])
+        response = response * np.exp(exponent)
+
+    # Apply RX FFE, taps are one symbol apart and the first is not delayed
+    if FFE.addEqualization:
+        FFETaps = np.column_stack([knobValues('receiver.FFE.taps.'+tapName) for tapName in orderTapNames(FFE.taps)])
+        delays = np.exp(-2j*np.pi*np.outer(np.arange(FFETaps.shape[1]), freqs)*samplesPerSymb*samplePeriod)
+        response = response * (FFETaps @ delays)
+
+    # DFE taps of every candidate
+    if DFE.addEqualization:
+        DFENames, positions = orderDFETaps(DFE.taps)
+        DFETaps = np.column_stack([knobValues('receiver.DFE.taps.'+tapName) for tapName in DFENames]) if DFENames else np.zeros((candidateCount, 0))
+
+    # Form outputs
+    pulses = nothing()
+    for chName in chNames:
+        length = len(channels.__dict__[chName].pulseResponse)
+        start = (min(length, symbols.shape[1])-1)//2
+        outputSignals = fft.irfft(channelSpectrum(channels.__dict__[chName], fftLength)*response, fftLength, axis=1)[:, start:start+length+extension]
+
+        # Apply RX DFE and limit length of each pulse
+        limited = []
+        for candidate in range(candidateCount):
+            outputSignal = outputSignals[candidate]
+            if chName == 'thru' and DFE.addEqualization:
+                outputSignal = applyDFETaps(simSettings, outputSignal, list(DFETaps[candidate]), positions)
+            limited.append(limitPulse(simSettings, outputSignal))
+
+        # Pulses that could not be centered are longer, shorter ones are padded at the end
+        width = max(len(pulse) for pulse in limited)
+        pulses.__dict__[chName] = np.stack([np.concatenate((pulse, np.zeros((width-len(pulse),)))) for pulse in limited])
+
+    return pulses, successful
+
+
 ###########################################################################
 # This function applies the receiver DFE to the pulse response. Since a
 # DFE is not LTI, this function approximates the effect by sutracting the
@@ -460,10 +972,6 @@ def applyRXFFE(simSettings: simulationSettings, simResults: simulationStatus):
 def applyRXDFE(simSettings: simulationSettings, simResults: simulationStatus):
 
     # Import variables
-    signalingMode   = simSettings.general.signalingMode
-    samplesPerSymb  = simSettings.general.samplesPerSymb.value
-    approximate     = simSettings.channel.approximate
-    supplyVoltage   = simSettings.receiver.signalAmplitude.value
     taps            = simSettings.receiver.DFE.taps
     addEqualization = simSettings.receiver.DFE.addEqualization
     inputSignals = simResults.pulseResponse.receiver.FFE.outputs
@@ -482,40 +990,17 @@ def applyRXDFE(simSettings: simulationSettings, simResults: simulationStatus):
             simResults.pulseResponse.receiver.DFE.outputs.__dict__[chName] = inputSignals.__dict__[chName]
             continue
         
-        # Find pulse peak location
-        inputSignal = inputSignals.__dict__[chName]
-        peakLoc = findPeakPulse(abs(inputSignal))
-        
         # Apply DFE
+        inputSignal = inputSignals.__dict__[chName]
         outputSignal = inputSignal
         if addEqualization:
 
             # Order taps
-            tapNames = list(taps.__dict__)
-            tapNames.sort()
-            response = []
-            post = 1
-            for tapName in tapNames:
-                if tapName == ('post' + str(post)):
-                    response.append(taps.__dict__[tapName].value)
-                    post = post+1
-
+            tapNames, positions = orderDFETaps(taps)
+            response = [taps.__dict__[tapName].value for tapName in tapNames]
             
             # Apply equalization
-            for index in range(len(response)):
-                tapName = list(tapNames)[index]
-                position = float(tapName[-1])
-
-                if signalingMode == '1+D' or signalingMode == '1+0.5D':
-                    startIdx = round(peakLoc+(position-1)*samplesPerSymb)
-                    endIdx = round(peakLoc+position*samplesPerSymb)
-                else:
-                    startIdx = round(peakLoc+(position-0.5)*samplesPerSymb)
-                    endIdx = round(peakLoc+(position+0.5)*samplesPerSymb)
-                
-                startIdx = max(min(startIdx,len(outputSignal)-samplesPerSymb),1)
-                endIdx = max(min(endIdx,len(outputSignal)),samplesPerSymb)
-                outputSignal[startIdx:endIdx] = outputSignal[startIdx:endIdx]+response[index]*supplyVoltage
+            outputSignal = applyDFETaps(simSettings, outputSignal, response, positions)
     
         # Save results
         simResults.pulseResponse.receiver.DFE.inputs.__dict__[chName] = inputSignal
@@ -531,10 +1016,6 @@ def applyRXDFE(simSettings: simulationSettings, simResults: simulationStatus):
 def limitLength(simSettings,simResults):
 
     # Import variables
-    signalingMode   = simSettings.general.signalingMode
-    samplesPerSymb  = simSettings.general.samplesPerSymb.value
-    preCursorCount  = simSettings.transmitter.preCursorCount.value
-    postCursorCount = simSettings.transmitter.postCursorCount.value
     approximate     = simSettings.channel.approximate
     pulses     = simResults.pulseResponse.receiver.DFE.outputs
     successful = simResults.results.successful
@@ -550,42 +1031,107 @@ def limitLength(simSettings,simResults):
             if chName in ['next', 'fext', 'xtalk']:
                 continue
         
-        # Locate pulse peak
-        pulse = np.round(pulses.__dict__[chName], 6)
-
-        # In MATLAB the pulse was read from both ends to find the center of a pulse (if it was a plateau).
-        # With SciPy this not not needed, it returns the center of a peak by default instead of the leading edge
-        peakLoc = findPeakPulse(pulse)
-
-        # Limit length
-        if signalingMode == '1+D':
-            startIdx = round(peakLoc-(preCursorCount+1)*samplesPerSymb)
-            endIdx = round(peakLoc+(postCursorCount)*samplesPerSymb)
-        elif signalingMode == '1+0.5D':
-            startIdx = round(peakLoc-(preCursorCount+2/3)*samplesPerSymb)
-            endIdx = round(peakLoc+(postCursorCount+1/3)*samplesPerSymb)
-        else:
-            startIdx = round(peakLoc-(preCursorCount+0.5)*samplesPerSymb)
-            endIdx = round(peakLoc+(postCursorCount+0.5)*samplesPerSymb)
-        
-
-        # Adjust 
-        if endIdx > len(pulses.__dict__[chName]):
-            pulses.__dict__[chName] = np.concatenate((pulses.__dict__[chName], np.zeros((endIdx-len(pulses.__dict__[chName]),))))
-        else:
-            pulses.__dict__[chName] = pulses.__dict__[chName][:endIdx]
-        
-        
-        # Adjust beginning
-        if startIdx < 1:
-            diff = 1-startIdx
-            pulses.__dict__[chName] = np.concatenate((np.zeros((diff,)), pulses.__dict__[chName][0:endIdx]))
-            print('Having trouble finding main cursor!\n')
-            #successful = False
-        else:
-            pulses.__dict__[chName] = pulses.__dict__[chName][startIdx:]
+        pulses.__dict__[chName] = limitPulse(simSettings, pulses.__dict__[chName])
     
     # Save results
     simResults.pulseResponse.receiver.outputs = pulses
     simResults.results.successful = successful
 
+
+###########################################################################
+# This function orders the DFE taps by post-cursor, stopping at the first
+# missing one, and returns their names and positions [UI].
+###########################################################################
+def orderDFETaps(taps):
+
+    tapNames = list(taps.__dict__)
+    tapNames.sort()
+    orderedNames = []
+    post = 1
+    for tapName in tapNames:
+        if tapName == ('post' + str(post)):
+            orderedNames.append(tapName)
+            post = post+1
+
+    positions = [float(tapNames[index][-1]) for index in range(len(orderedNames))]
+
+    return orderedNames, positions
+
+
+###########################################################################
+# This function subtracts the DFE taps from a pulse, each over the symbol
+# period of its post-cursor.
+###########################################################################
+def applyDFETaps(simSettings: simulationSettings, inputSignal: np.ndarray, response: list, positions: list) -> np.ndarray:
+
+    # Import variables
+    signalingMode   = simSettings.general.signalingMode
+    samplesPerSymb  = simSettings.general.samplesPerSymb.value
+    supplyVoltage   = simSettings.receiver.signalAmplitude.value
+
+    # Find pulse peak location
+    peakLoc = findPeakPulse(abs(inputSignal))
+
+    outputSignal = inputSignal
+    for index in range(len(response)):
+        position = positions[index]
+
+        if signalingMode == '1+D' or signalingMode == '1+0.5D':
+            startIdx = round(peakLoc+(position-1)*samplesPerSymb)
+            endIdx = round(peakLoc+position*samplesPerSymb)
+        else:
+            startIdx = round(peakLoc+(position-0.5)*samplesPerSymb)
+            endIdx = round(peakLoc+(position+0.5)*samplesPerSymb)
+        
+        startIdx = max(min(startIdx,len(outputSignal)-samplesPerSymb),1)
+        endIdx = max(min(endIdx,len(outputSignal)),samplesPerSymb)
+        outputSignal[startIdx:endIdx] = outputSignal[startIdx:endIdx]+response[index]*supplyVoltage
+
+    return outputSignal
+
+
+###########################################################################
+# This function limits the length of a pulse to the required cursors
+# around its peak.
+###########################################################################
+def limitPulse(simSettings: simulationSettings, pulse: np.ndarray) -> np.ndarray:
+
+    # Import variables
+    signalingMode   = simSettings.general.signalingMode
+    samplesPerSymb  = simSettings.general.samplesPerSymb.value
+    preCursorCount  = simSettings.transmitter.preCursorCount.value
+    postCursorCount = simSettings.transmitter.postCursorCount.value
+
+    # In MATLAB the pulse was read from both ends to find the center of a pulse (if it was a plateau).
+    # With SciPy this not not needed, it returns the center of a peak by default instead of the leading edge
+    peakLoc = findPeakPulse(np.round(pulse, 6))
+
+    # Limit length
+    if signalingMode == '1+D':
+        startIdx = round(peakLoc-(preCursorCount+1)*samplesPerSymb)
+        endIdx = round(peakLoc+(postCursorCount)*samplesPerSymb)
+    elif signalingMode == '1+0.5D':
+        startIdx = round(peakLoc-(preCursorCount+2/3)*samplesPerSymb)
+        endIdx = round(peakLoc+(postCursorCount+1/3)*samplesPerSymb)
+    else:
+        startIdx = round(peakLoc-(preCursorCount+0.5)*samplesPerSymb)
+        endIdx = round(peakLoc+(postCursorCount+0.5)*samplesPerSymb)
+    
+
+    # Adjust 
+    if endIdx > len(pulse):
+        pulse = np.concatenate((pulse, np.zeros((endIdx-len(pulse),))))
+    else:
+        pulse = pulse[:endIdx]
+    
+    
+    # Adjust beginning
+    if startIdx < 1:
+        diff = 1-startIdx
+        pulse = np.concatenate((np.zeros((diff,)), pulse[0:endIdx]))
+        print('Having trouble finding main cursor!\n')
+        #successful = False
+    else:
+        pulse = pulse[startIdx:]
+
+    return pulse
@@ -65,6 +65,8 @@ def addGeneralSettings(simSettings: simulationSettings):
     addLimits(simSettings.general.samplerNumb,15,1,1)
     addLimits(simSettings.general.numbSymb,10,1,1)
     addLimits(simSettings.general.targetBER,1e-1,1e-12,[])
+    addLimits(simSettings.general.workerCount,256,1,1)
+    addLimits(simSettings.general.ISIBlockSize,1e8,1,1)
 
 
 ###########################################################################
@@ -125,6 +127,13 @@ def addChannelSettings(simSettings: simulationSettings):
     addLimits(simSettings.channel.notchFreq,50e9,0.5e9,[])
     addLimits(simSettings.channel.notchAttenuation,100,0,1)
     addLimits(simSettings.channel.noise.noiseDensity,[],0,[])
+    addLimits(simSettings.channel.decimationSpan,1e4,10,1)
+    addLimits(simSettings.channel.decimationBandLimit,100,0.5,[])
+    addLimits(simSettings.channel.truncationEnergy,1,0.5,[])
+    addLimits(simSettings.channel.truncationSpan,1e4,2,1)
+    addLimits(simSettings.channel.rationalPoleCount,400,2,2)
+    addLimits(simSettings.channel.rationalSpan,1e4,10,1)
+    addLimits(simSettings.channel.rationalTolerance,1,0,[])
 
 
 ###########################################################################
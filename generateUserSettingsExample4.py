@@ -29,6 +29,17 @@ def generateUserSettings() -> simulationSettings:
     # Target BER
     simSettings.general.targetBER.value = 1e-6 # used for measurement purposes
 
+    # Parallel processing
+    simSettings.general.workerCount.value = 4 # number of parallel workers (1: run serially)
+
+    # Pulse response engine ('time','frequency','superposition')
+    simSettings.general.pulseEngine = 'time'
+
+    # ISI generation mode ('enumerate': every cursor combination, 'stream': every cursor combination in blocks, 'convolve': statistically by convolving cursor distributions)
+    simSettings.general.ISIMode = 'enumerate'
+    simSettings.general.ISIBlockSize.value = 65536 # number of cursor combinations enumerated at once when streaming
+    simSettings.general.foldISI = True # enumerate only one of each pair of mirrored transitions and reflect it for the other (when enumerating or streaming)
+
     # Display responses
     simSettings.general.plotting.channelResponse = True
     simSettings.general.plotting.CTLEResponse    = True
@@ -153,7 +164,7 @@ def generateUserSettings() -> simulationSettings:
     # Make cross-talk channels asynchronous
     simSettings.channel.makeAsynchronous = True
 
-    # Channel file names (ensure channel data has same frequency points)
+    # Channel file names (files measured at different frequency points are resampled onto a common grid)
     simSettings.channel.fileNames.thru = 'C2M__Z100_IL14_WC_BOR_H_L_H_THRU.s4p'
     simSettings.channel.fileNames.next1 = 'C2M__Z100_IL14_WC_BOR_H_L_H_NEXT1.s4p'
     simSettings.channel.fileNames.next2 = 'C2M__Z100_IL14_WC_BOR_H_L_H_NEXT2.s4p'
@@ -163,6 +174,31 @@ def generateUserSettings() -> simulationSettings:
     simSettings.channel.fileNames.fext2 = 'C2M__Z100_IL14_WC_BOR_H_L_H_FEXT2.s4p'
     simSettings.channel.fileNames.fext3 = 'C2M__Z100_IL14_WC_BOR_H_L_H_FEXT3.s4p'
 
+    # Touchstone port pairs ([positive, negative]) of the channel input and output
+    simSettings.channel.portMap = [[1, 3], [2, 4]]
+
+    # Cache parsed Touchstone files to speed up subsequent runs
+    simSettings.channel.cacheChannels = True
+
+    # Keep final pulse responses on disk so later runs with the same channels and equalization skip generating them (not while adapting)
+    simSettings.channel.cachePulses = True
+
+    # Band-limit channel data before creating pulse responses (speeds up simulation, reduces accuracy)
+    simSettings.channel.decimate = False
+    simSettings.channel.decimationSpan.value = 200    # time window kept around the impulse peak [UI]
+    simSettings.channel.decimationBandLimit.value = 2 # highest frequency kept [symbol rate]
+
+    # Truncate impulse responses around their peak ('none', 'energy', 'span')
+    simSettings.channel.truncationMode = 'none'
+    simSettings.channel.truncationEnergy.value = 0.99999 # fraction of impulse energy kept ('energy' mode)
+    simSettings.channel.truncationSpan.value = 100       # span kept around the impulse peak [UI] ('span' mode)
+
+    # Fit channels with rational models and create pulse responses from them by recursive filtering
+    simSettings.channel.rationalModel = False
+    simSettings.channel.rationalPoleCount.value = 60   # number of poles
+    simSettings.channel.rationalSpan.value = 200       # length of pulse responses after the pulse [UI]
+    simSettings.channel.rationalTolerance.value = 0.01 # largest relative RMS fit error of a model that is used
+
     # Noise
     simSettings.channel.noise.addNoise = True
     simSettings.channel.noise.noiseDensity.value = 5.2e-17*3 # channel noise density [V^2/Hz]
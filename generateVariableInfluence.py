@@ -23,6 +23,7 @@
 
 from userSettingsObjects import simulationSettings, nothing
 from initializeSimulation import simulationStatus
+from tabulateCTLE import lookupCTLE
 import control.matlab as ml
 import numpy as np
 import scipy.stats as stats
@@ -33,6 +34,18 @@ def generateVariableInfluence(simSettings: simulationSettings, simResults: simul
     # Generate CTLE responses
     generateCTLE(simSettings, simResults)
 
+    # Generate noise distributions
+    generateNoiseInfluence(simSettings, simResults)
+
+
+###########################################################################
+# This function creates the noise distributions at the receiver output.
+# They depend on the RX gain, CTLE and FFE settings, so the CTLE response
+# must already be generated.
+###########################################################################
+def generateNoiseInfluence(simSettings: simulationSettings, simResults: simulationStatus):
+    ml.use_matlab_defaults() # Needed to ensure compatibility with MATLAB expectations for control code
+
     # Calculate RMS of RX FFE tap values
     calculateFFERMS(simSettings, simResults)
 
@@ -49,8 +62,7 @@ def generateVariableInfluence(simSettings: simulationSettings, simResults: simul
     combineInfluences(simSettings, simResults)
 
 class CTLE:
-    def __init__(self, tf, mag, ph, freq):
-        self.transferFunc = tf
+    def __init__(self, mag, ph, freq):
         self.magnitude = mag
         self.phase = ph
         self.frequency = freq
@@ -58,7 +70,7 @@ class CTLE:
 
 ###########################################################################
 # This function determines if the CTLE response for the given knob settings
-# has already been calculated. If not it calculates the transfer function.
+# has already been calculated. If not it looks it up in the CTLE table.
 ###########################################################################
 def generateCTLE(simSettings: simulationSettings, simResults: simulationStatus):
     
@@ -71,8 +83,7 @@ def generateCTLE(simSettings: simulationSettings, simResults: simulationStatus):
     pole2Freq       = simSettings.receiver.CTLE.pole2Freq.value
     pole2Numb       = simSettings.receiver.CTLE.pole2Numb.value
     channelFreqs = simResults.influenceSources.channel.thru.frequencies
-    zeroName     = ('z' + str(zeroFreq/1e9)).replace('.', '_')
-    poleName     = ('z' + str(pole1Freq/1e9)).replace('.', '_')
+    zeroName, poleName = CTLENames(simSettings)
     
     # Define CTLE transfer function
     if addEqualization:
@@ -96,43 +107,75 @@ def generateCTLE(simSettings: simulationSettings, simResults: simulationStatus):
         # Return if CTLE already calculated
         if calculated: return
         
-        # Calculate new TF
+        # Look up new response
         else:
-            
-            # Add first zero
-            wz = 2*np.pi*zeroFreq
-            listWz = -np.ones((zeroNumb,)) * wz
-            gain = (1/wz) ** zeroNumb
-            
-            # Add first pole
-            wp1 = 2*np.pi*pole1Freq
-            listWp1 = -np.ones((pole1Numb,)) * wp1
-            gain = gain * ((wp1) ** pole1Numb)
-
-            # Add additional poles
-            wp2 = 2*np.pi*pole2Freq
-            listWp2 = -np.ones((pole2Numb,)) * wp2
-            gain = gain * ((wp2) ** pole2Numb)
-
-            # Combine pole lists
-            listWp = np.concatenate((listWp1, listWp2))
-
-            # Combine transfer functions
-            transferFunc = ml.zpk(listWz,listWp,gain)
+            table = simResults.influenceSources.CTLETable
+            magnitude, phase = lookupCTLE(table, zeroFreq, zeroNumb, pole1Freq, pole1Numb, pole2Freq, pole2Numb)
         
     else:
-        transferFunc = ml.tf([1],[1])
+        magnitude = np.ones((len(channelFreqs),))
+        phase = np.zeros((len(channelFreqs),))
     
 
     # Save results
-    magnitude, phase, w = ml.bode(transferFunc, 2*np.pi*channelFreqs, plot=False) # force frequencies to be same as channel
-    temp = CTLE(transferFunc, magnitude, phase, channelFreqs)
+    temp = CTLE(magnitude, phase, channelFreqs)
     if 'RXCTLE' not in simResults.influenceSources.__dict__:
         setattr(simResults.influenceSources, 'RXCTLE', nothing())
-    setattr(simResults.influenceSources.RXCTLE, zeroName, nothing())
+    if zeroName not in simResults.influenceSources.RXCTLE.__dict__:
+        setattr(simResults.influenceSources.RXCTLE, zeroName, nothing())
     setattr(simResults.influenceSources.RXCTLE.__dict__[zeroName], poleName, temp)
 
 
+###########################################################################
+# This function returns the names a CTLE response is saved under. Every
+# zero and pole setting is included so each distinct transfer function has
+# its own entry.
+###########################################################################
+def CTLENames(simSettings: simulationSettings):
+
+    # Import variables
+    zeroFreq  = simSettings.receiver.CTLE.zeroFreq.value
+    zeroNumb  = simSettings.receiver.CTLE.zeroNumb.value
+    pole1Freq = simSettings.receiver.CTLE.pole1Freq.value
+    pole1Numb = simSettings.receiver.CTLE.pole1Numb.value
+    pole2Freq = simSettings.receiver.CTLE.pole2Freq.value
+    pole2Numb = simSettings.receiver.CTLE.pole2Numb.value
+
+    zeroName = ('z' + str(zeroFreq/1e9) + 'n' + str(zeroNumb)).replace('.', '_')
+    poleName = ('p' + str(pole1Freq/1e9) + 'n' + str(pole1Numb) + 'p' + str(pole2Freq/1e9) + 'n' + str(pole2Numb)).replace('.', '_')
+
+    return zeroName, poleName
+
+
+###########################################################################
+# This function creates the CTLE transfer function. The zeros provide
+# peaking, followed by the first and additional poles. The gain is set for
+# unity gain at DC.
+###########################################################################
+def createCTLE(zeroFreq: float, zeroNumb: int, pole1Freq: float, pole1Numb: int, pole2Freq: float, pole2Numb: int):
+
+    # Add first zero
+    wz = 2*np.pi*zeroFreq
+    listWz = -np.ones((zeroNumb,)) * wz
+    gain = (1/wz) ** zeroNumb
+    
+    # Add first pole
+    wp1 = 2*np.pi*pole1Freq
+    listWp1 = -np.ones((pole1Numb,)) * wp1
+    gain = gain * ((wp1) ** pole1Numb)
+
+    # Add additional poles
+    wp2 = 2*np.pi*pole2Freq
+    listWp2 = -np.ones((pole2Numb,)) * wp2
+    gain = gain * ((wp2) ** pole2Numb)
+
+    # Combine pole lists
+    listWp = np.concatenate((listWp1, listWp2))
+
+    # Combine transfer functions
+    return ml.zpk(listWz,listWp,gain)
+
+
 ###########################################################################
 # This function calculates the RMS value of the RX FFE tap settings. This
 # value is required later for output-refering noise.
@@ -149,10 +192,13 @@ def calculateFFERMS(simSettings: simulationSettings, simResults: simulationStatu
     
     tapRMS = np.sqrt(FFESum)
     
-    # Save results
-    setattr(simResults, 'pulseResponse', nothing())
-    setattr(simResults.pulseResponse, 'receiver', nothing())
-    setattr(simResults.pulseResponse.receiver, 'FFE', nothing())
+    # Save results (keeping any pulse response of the same settings)
+    if 'pulseResponse' not in simResults.__dict__:
+        setattr(simResults, 'pulseResponse', nothing())
+    if 'receiver' not in simResults.pulseResponse.__dict__:
+        setattr(simResults.pulseResponse, 'receiver', nothing())
+    if 'FFE' not in simResults.pulseResponse.receiver.__dict__:
+        setattr(simResults.pulseResponse.receiver, 'FFE', nothing())
     setattr(simResults.pulseResponse.receiver.FFE, 'tapRMS', tapRMS)
 
 
@@ -182,15 +228,12 @@ def generateTXNoise(simSettings: simulationSettings, simResults: simulationStatu
     usePreAmp     = simSettings.receiver.preAmp.addGain
     gain          = simSettings.receiver.preAmp.gain.value
     useCTLE       = simSettings.receiver.CTLE.addEqualization
-    zeroFreq      = simSettings.receiver.CTLE.zeroFreq.value
-    pole1Freq     = simSettings.receiver.CTLE.pole1Freq.value
     useFFE        = simSettings.receiver.FFE.addEqualization
     
     FFERMS        = simResults.pulseResponse.receiver.FFE.tapRMS
     channelFreqs  = simResults.influenceSources.channel.thru.frequencies
     channelTF     = simResults.influenceSources.channel.thru.transferFunction
-    zeroName     = ('z' + str(zeroFreq/1e9)).replace('.', '_')
-    poleName     = ('z' + str(pole1Freq/1e9)).replace('.', '_')
+    zeroName, poleName = CTLENames(simSettings)
     CTLEMagnitude = simResults.influenceSources.RXCTLE.__dict__[zeroName].__dict__[poleName].magnitude
     
     # Add random noise
@@ -282,12 +325,9 @@ def generateChannelNoise(simSettings: simulationSettings, simResults: simulation
     usePreAmp     = simSettings.receiver.preAmp.addGain
     gain          = simSettings.receiver.preAmp.gain.value
     useCTLE       = simSettings.receiver.CTLE.addEqualization
-    zeroFreq      = simSettings.receiver.CTLE.zeroFreq.value
-    pole1Freq     = simSettings.receiver.CTLE.pole1Freq.value
     useFFE        = simSettings.receiver.FFE.addEqualization
     FFERMS   = simResults.pulseResponse.receiver.FFE.tapRMS
-    zeroName     = ('z' + str(zeroFreq/1e9)).replace('.', '_')
-    poleName     = ('z' + str(pole1Freq/1e9)).replace('.', '_')
+    zeroName, poleName = CTLENames(simSettings)
     CTLE     = simResults.influenceSources.RXCTLE.__dict__[zeroName].__dict__[poleName]
         
     # Add random noise
@@ -344,12 +384,9 @@ def generateRXNoise(simSettings: simulationSettings, simResults: simulationStatu
     usePreAmp     = simSettings.receiver.preAmp.addGain
     gain          = simSettings.receiver.preAmp.gain.value
     useCTLE       = simSettings.receiver.CTLE.addEqualization    
-    zeroFreq      = simSettings.receiver.CTLE.zeroFreq.value
-    pole1Freq     = simSettings.receiver.CTLE.pole1Freq.value
     useFFE        = simSettings.receiver.FFE.addEqualization
     FFERMS   = simResults.pulseResponse.receiver.FFE.tapRMS
-    zeroName     = ('z' + str(zeroFreq/1e9)).replace('.', '_')
-    poleName     = ('z' + str(pole1Freq/1e9)).replace('.', '_')
+    zeroName, poleName = CTLENames(simSettings)
     CTLE     = simResults.influenceSources.RXCTLE.__dict__[zeroName].__dict__[poleName]
     
     # Add random noise
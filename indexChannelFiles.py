@@ -0,0 +1,190 @@
+###########################################################################
+#
+#   StatOpt Simulator
+#   by Jeremy Cosson-Martin, Jhoan Salinas of
+#   Ali Sheikholeslami's group
+#   Ported to Python 3 by Savo Bajic
+#   Department of Electrical and Computer Engineering
+#   University of Toronto
+#   Copyright Material
+#   For personal use only
+#
+###########################################################################
+# These functions maintain an index of the Touchstone files in the channels
+# folder so channels can be compared without running a simulation. For
+# each file the index holds the number of ports and frequency range, along
+# with metrics that depend on the symbol rate: the insertion loss at the
+# Nyquist frequency and the crosstalk noise power the channel contributes
+# as an aggressor. Files only need to be read when they are new, changed or
+# a new symbol rate is requested, for which the parsed-channel cache is
+# used.
+#
+# Channels are grouped by the part of their file name in front of "THRU",
+# "NEXT" or "FEXT". The integrated crosstalk noise (ICN) of a group is the
+# power sum of its NEXT and FEXT aggressors weighted by the transmitted
+# spectrum, following IEEE 802.3 annex 69B.
+#
+###########################################################################
+
+import numpy as np
+import json
+import os
+import re
+from loadChannelFiles import loadTouchstoneChannel, isTouchstoneFile, channelFolder, cacheFolder
+
+indexAddress = os.path.join(cacheFolder, 'index.json')
+
+class channelRanking:
+    def __init__(self, group, thru, insertionLoss, nextNoise, fextNoise, noise, ratio):
+        self.group = group
+        self.thru = thru
+        self.insertionLoss = insertionLoss
+        self.nextNoise = nextNoise
+        self.fextNoise = fextNoise
+        self.noise = noise
+        self.ratio = ratio
+
+
+###########################################################################
+# This function brings the index up to date with the channels folder for
+# the given symbol rate and returns it. Entries of removed files are
+# dropped and entries of new or changed files are rebuilt.
+###########################################################################
+def updateChannelIndex(symbolRate: float, tRise: float, portMap, useCache: bool = True) -> dict:
+
+    index = readIndex()
+    if index.get('portMap') != portMap:
+        index = {'portMap': portMap, 'files': {}} # Metrics depend on the port map
+    metricKey = '{0:.6e},{1:.6e}'.format(symbolRate, tRise)
+
+    fileNames = sorted(name for name in os.listdir(channelFolder) if isTouchstoneFile(name))
+    files = {}
+    for fileName in fileNames:
+        fileStats = os.stat(os.path.join(channelFolder, fileName))
+        entry = index['files'].get(fileName)
+
+        # Forget entries of changed files
+        if entry is None or entry['modifiedTime'] != fileStats.st_mtime or entry['size'] != fileStats.st_size:
+            entry = None
+
+        # Read file if anything is missing
+        if entry is None or metricKey not in entry['metrics']:
+            channel = loadTouchstoneChannel(fileName, portMap, useCache)
+            if entry is None:
+                entry = describeChannel(fileName, fileStats, channel)
+            entry['metrics'][metricKey] = channelMetrics(channel.frequencies, channel.transferFunction, symbolRate, tRise, entry['role'])
+
+        files[fileName] = entry
+
+    index['files'] = files
+    writeIndex(index)
+
+    return index
+
+
+###########################################################################
+# This function ranks the thru channels of the index by the ratio of their
+# signal amplitude at the Nyquist frequency to the integrated crosstalk
+# noise of their group (best first). Noise values are in volts.
+###########################################################################
+def rankChannels(index: dict, symbolRate: float, tRise: float, amplitude: float) -> list:
+
+    metricKey = '{0:.6e},{1:.6e}'.format(symbolRate, tRise)
+
+    # Power sum crosstalk of every group
+    nextPower = {}
+    fextPower = {}
+    for entry in index['files'].values():
+        power = entry['metrics'][metricKey]['crosstalkPower'] * amplitude**2
+        if entry['role'] == 'next':
+            nextPower[entry['group']] = nextPower.get(entry['group'], 0) + power
+        elif entry['role'] == 'fext':
+            fextPower[entry['group']] = fextPower.get(entry['group'], 0) + power
+
+    # Rate thru channels
+    rankings = []
+    for fileName, entry in index['files'].items():
+        if entry['role'] != 'thru':
+            continue
+
+        insertionLoss = entry['metrics'][metricKey]['insertionLoss']
+        nextNoise = np.sqrt(nextPower.get(entry['group'], 0))
+        fextNoise = np.sqrt(fextPower.get(entry['group'], 0))
+        noise = np.sqrt(nextNoise**2 + fextNoise**2)
+        signal = amplitude * 10**(-insertionLoss/20)
+        ratio = 20*np.log10(signal/noise) if noise > 0 else np.inf
+
+        rankings.append(channelRanking(entry['group'], fileName, insertionLoss, nextNoise, fextNoise, noise, ratio))
+
+    rankings.sort(key=lambda ranking: ranking.ratio, reverse=True)
+
+    return rankings
+
+
+###########################################################################
+# This function creates the index entry of a channel file without metrics.
+###########################################################################
+def describeChannel(fileName: str, fileStats, channel) -> dict:
+
+    freqs = channel.frequencies
+    match = re.search(r'(thru|next|fext)', fileName, re.IGNORECASE)
+    if match is None:
+        role = 'thru'
+        group = fileName
+    else:
+        role = match.group(1).lower()
+        group = fileName[:match.start()]
+
+    return {'modifiedTime': fileStats.st_mtime, 'size': fileStats.st_size, 'ports': int(channel.sParameters.shape[1]),
+            'frequencyMin': float(freqs[0]), 'frequencyMax': float(freqs[-1]), 'frequencyStep': float(freqs[1] - freqs[0]),
+            'role': role, 'group': group, 'metrics': {}}
+
+
+###########################################################################
+# This function calculates the symbol rate dependent metrics of a channel.
+# The insertion loss is taken at the Nyquist frequency, the crosstalk power
+# is the channel's ICN contribution for a unit transmit amplitude.
+###########################################################################
+def channelMetrics(freqs: np.ndarray, tranFunc: np.ndarray, symbolRate: float, tRise: float, role: str) -> dict:
+
+    magnitude = np.abs(tranFunc)
+    insertionLoss = -20*np.log10(np.interp(symbolRate/2, freqs, magnitude))
+
+    # Transmitted power spectrum (sinc shaped symbols, driver edge and receiver filter)
+    edgeFreq = 0.2365 / tRise
+    receiverFreq = 0.75 * symbolRate
+    weight = 1/symbolRate * np.sinc(freqs/symbolRate)**2 / (1 + (freqs/edgeFreq)**4) / (1 + (freqs/receiverFreq)**8)
+
+    crosstalkPower = 0.0
+    if role != 'thru':
+        fStep = freqs[1] - freqs[0]
+        crosstalkPower = 2*fStep * np.sum(weight * magnitude**2)
+
+    return {'insertionLoss': float(insertionLoss), 'crosstalkPower': float(crosstalkPower)}
+
+
+###########################################################################
+# This function reads the index file, an empty index is returned if it is
+# missing or unreadable.
+###########################################################################
+def readIndex() -> dict:
+
+    try:
+        with open(indexAddress, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {'portMap': None, 'files': {}}
+
+
+###########################################################################
+# This function saves the index file through a temporary file.
+###########################################################################
+def writeIndex(index: dict):
+
+    os.makedirs(cacheFolder, exist_ok=True)
+    tempAddress = '{0}.{1:d}.tmp'.format(indexAddress, os.getpid())
+
+    with open(tempAddress, 'w') as file:
+        json.dump(index, file, indent=1)
+
+    os.replace(tempAddress, indexAddress)
@@ -0,0 +1,243 @@
+###########################################################################
+#
+#   StatOpt Simulator
+#   by Jeremy Cosson-Martin, Jhoan Salinas of
+#   Ali Sheikholeslami's group
+#   Ported to Python 3 by Savo Bajic
+#   Department of Electrical and Computer Engineering
+#   University of Toronto
+#   Copyright Material
+#   For personal use only
+#
+###########################################################################
+# These functions read Touchstone channel descriptions from the channels
+# folder and derive their differential transfer function. Files with any
+# number of ports are supported, the port pairs forming the input and
+# output of the differential channel are selected by a port map. Parsing
+# the text files is slow, so the frequency points, S-parameters and
+# transfer function are stored in a compressed cache inside the channels
+# folder. A cached entry is only used while both the content hash and
+# modification time of its Touchstone file are unchanged, otherwise the
+# file is parsed again and the entry is replaced.
+#
+###########################################################################
+
+import numpy as np
+import hashlib
+import os
+import re
+from functools import partial
+from loadTouchstoneFiles import readTouchstone
+from runConcurrently import mapConcurrently
+
+channelFolder = os.path.join('.', 'channels')
+cacheFolder = os.path.join(channelFolder, 'cache')
+
+class channelFile:
+    def __init__(self, freqs, sParams, z0, tranFunc):
+        self.frequencies = freqs
+        self.sParameters = sParams
+        self.z0 = z0
+        self.transferFunction = tranFunc
+
+
+###########################################################################
+# This function returns the data for a Touchstone channel file, either
+# from the cache or by parsing the file (updating the cache afterwards).
+###########################################################################
+def loadTouchstoneChannel(fileName: str, portMap, useCache: bool = True) -> channelFile:
+
+    fileAddress = os.path.join(channelFolder, fileName)
+    cacheAddress = os.path.join(cacheFolder, fileName + '.npz')
+
+    # Identify the current version of the file
+    fileHash = hashFile(fileAddress)
+    modifiedTime = os.path.getmtime(fileAddress)
+
+    # Use cached data if it is still valid
+    if useCache:
+        channel = readCache(cacheAddress, fileHash, modifiedTime, portMap)
+        if channel is not None:
+            return channel
+
+    # Parse file
+    try:
+        freqs, sParams, z0 = readTouchstone(fileAddress)
+    except ValueError as error:
+        print('ERROR: Touchstone file "{0:s}" could not be read, {1}.\n----------------SIMULATION ABORTING----------------'.format(fileName, error))
+        quit()
+    z0 = z0[0]
+
+    # Convert to differential transfer function
+    if not checkPortMap(portMap, sParams.shape[1]):
+        print('ERROR: port map {0} cannot be applied to the {1:d} port channel "{2:s}".\n----------------SIMULATION ABORTING----------------'.format(portMap, sParams.shape[1], fileName))
+        quit()
+
+    tranFunc = differentialTransferFunction(sParams, z0, portMap)
+
+    channel = channelFile(freqs, sParams, z0, tranFunc)
+
+    # Update cache
+    if useCache:
+        writeCache(cacheAddress, fileHash, modifiedTime, portMap, channel)
+
+    return channel
+
+
+###########################################################################
+# This function loads several Touchstone channel files and returns their
+# frequency points and transfer functions in the same order as the file
+# names. With more than one worker the files are parsed and converted in
+# separate processes.
+###########################################################################
+def loadTouchstoneChannels(fileNames: list, portMap, useCache: bool = True, workers: int = 1) -> list:
+
+    loader = partial(loadChannelResponse, portMap=portMap, useCache=useCache)
+
+    responses = mapConcurrently(loader, fileNames, workers, useProcesses=True)
+
+    return responses
+
+
+###########################################################################
+# This function returns only the frequency points and transfer function of
+# a Touchstone channel file, to limit what is sent between processes.
+###########################################################################
+def loadChannelResponse(fileName: str, portMap, useCache: bool = True):
+
+    channel = loadTouchstoneChannel(fileName, portMap, useCache)
+
+    return channel.frequencies, channel.transferFunction
+
+
+###########################################################################
+# This function converts single-ended S-parameters into mixed-mode
+# S-parameters for the given port pairs in one batched matrix product over
+# all frequency points. Each pair is [positive, negative] using the port
+# numbering of the Touchstone file (starting at 1). The differential
+# responses of all pairs come first, followed by the common mode ones.
+###########################################################################
+def mixedModeSParameters(sParams: np.ndarray, portMap) -> np.ndarray:
+
+    portCount = sParams.shape[1]
+    pairCount = len(portMap)
+
+    # Build conversion matrix
+    M = np.zeros((2*pairCount, portCount))
+    for index, (positive, negative) in enumerate(portMap):
+        M[index, positive-1] = 1
+        M[index, negative-1] = -1
+        M[pairCount+index, positive-1] = 1
+        M[pairCount+index, negative-1] = 1
+
+    # Apply to all frequencies at once
+    smmParams = (M @ sParams @ np.transpose(M)) / 2
+
+    return smmParams
+
+
+###########################################################################
+# This function calculates the differential mode transfer function from
+# the first port pair of the port map to the second, assuming 50 ohm source
+# and load impedances.
+###########################################################################
+def differentialTransferFunction(sParams: np.ndarray, z0, portMap) -> np.ndarray:
+
+    # Get differential S-parameters between the input and output pair
+    sParamsDiff = mixedModeSParameters(sParams, portMap[:2])[:, 0:2, 0:2]
+
+    # Assume source/load impedances of 50 ohm
+    zl = 50.0
+    zs = 50.0
+
+    # Reflection Coefficients
+    gammaL = 1 if zl == np.inf else (zl - z0) / (zl + z0)
+    gammaS = 1 if zs == np.inf else (zs - z0) / (zs + z0)
+
+    gammaIn = (sParamsDiff[:,0,0] + sParamsDiff[:,0,1] * sParamsDiff[:,1,0] * gammaL) / (1 - sParamsDiff[:,1,1] * gammaL)
+
+    tranFunc = sParamsDiff[:,1,0] * (1 + gammaL) * (1 - gammaS) / (1 - sParamsDiff[:,1,1] * gammaL) / (1 - gammaIn * gammaS)
+
+    return tranFunc
+
+
+###########################################################################
+# This function checks whether a port map can be applied to a channel file
+# with the given number of ports.
+###########################################################################
+def checkPortMap(portMap, portCount: int) -> bool:
+
+    ports = [port for pair in portMap for port in pair]
+
+    if len(portMap) < 2 or any(len(pair) != 2 for pair in portMap):
+        return False
+    if len(set(ports)) != len(ports):
+        return False
+
+    return all(1 <= port <= portCount for port in ports)
+
+
+###########################################################################
+# This function determines if a file is a Touchstone file (.s4p, .s8p...).
+###########################################################################
+def isTouchstoneFile(fileName: str) -> bool:
+    return re.fullmatch(r'.+\.s[0-9]+p', fileName.lower()) is not None
+
+
+###########################################################################
+# This function returns the SHA-256 hash of a file's contents.
+###########################################################################
+def hashFile(fileAddress: str) -> str:
+
+    fileHash = hashlib.sha256()
+    with open(fileAddress, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            fileHash.update(block)
+
+    return fileHash.hexdigest()
+
+
+###########################################################################
+# This function reads a cached channel. Nothing is returned if there is no
+# entry or if it was made from a different version of the channel file. If
+# the entry was made with another port map the transfer function is
+# recalculated from the cached S-parameters.
+###########################################################################
+def readCache(cacheAddress: str, fileHash: str, modifiedTime: float, portMap):
+
+    if not os.path.isfile(cacheAddress):
+        return None
+
+    try:
+        with np.load(cacheAddress, allow_pickle=False) as cached:
+            if str(cached['fileHash']) != fileHash or float(cached['modifiedTime']) != modifiedTime:
+                return None
+
+            channel = channelFile(cached['frequencies'], cached['sParameters'], cached['z0'][()], cached['transferFunction'])
+            samePortMap = np.array_equal(cached['portMap'], portMap)
+    except (OSError, KeyError, ValueError):
+        return None # Treat unreadable entries as missing, they are overwritten
+
+    if not samePortMap:
+        if not checkPortMap(portMap, channel.sParameters.shape[1]):
+            return None # Let the parser report the problem
+        channel.transferFunction = differentialTransferFunction(channel.sParameters, channel.z0, portMap)
+
+    return channel
+
+
+###########################################################################
+# This function saves a parsed channel to the cache. The entry is written
+# to a temporary file first so an interrupted run never leaves a partial
+# entry behind.
+###########################################################################
+def writeCache(cacheAddress: str, fileHash: str, modifiedTime: float, portMap, channel: channelFile):
+
+    os.makedirs(os.path.dirname(cacheAddress), exist_ok=True)
+    tempAddress = '{0}.{1:d}.tmp'.format(cacheAddress, os.getpid())
+
+    with open(tempAddress, 'wb') as file:
+        np.savez_compressed(file, fileHash=fileHash, modifiedTime=modifiedTime, portMap=np.array(portMap), frequencies=channel.frequencies,
+                            sParameters=channel.sParameters, z0=channel.z0, transferFunction=channel.transferFunction)
+
+    os.replace(tempAddress, cacheAddress)
@@ -0,0 +1,237 @@
+###########################################################################
+#
+#   StatOpt Simulator
+#   by Jeremy Cosson-Martin, Jhoan Salinas of
+#   Ali Sheikholeslami's group
+#   Ported to Python 3 by Savo Bajic
+#   Department of Electrical and Computer Engineering
+#   University of Toronto
+#   Copyright Material
+#   For personal use only
+#
+###########################################################################
+# These functions read S-parameter data from Touchstone files (version 1
+# and 2). The file is streamed in blocks of lines, comments and keywords
+# are handled line by line while the numeric data of each block is parsed
+# in bulk by NumPy. The option line is respected for frequency units, data
+# format (RI, MA or DB) and reference impedance.
+#
+# Outputs:
+#   frequencies: frequency points [Hz]
+#   sParams: S-parameters indexed as [frequency, output port, input port]
+#   z0: reference impedance of each port [ohm]
+#
+###########################################################################
+
+import numpy as np
+import itertools
+import re
+
+blockLines = 65536 # Number of lines parsed at once
+
+frequencyUnits = {'HZ': 1, 'KHZ': 1e3, 'MHZ': 1e6, 'GHZ': 1e9}
+dataFormats = ['RI', 'MA', 'DB']
+
+class touchstoneOptions:
+    def __init__(self):
+        self.frequencyUnit = 1e9 # Defaults given by the Touchstone specification
+        self.parameter = 'S'
+        self.dataFormat = 'MA'
+        self.resistance = 50.0
+
+class touchstoneKeywords:
+    def __init__(self):
+        self.version = 1
+        self.portCount = 0
+        self.twoPortOrder = '21_12'
+        self.matrixFormat = 'FULL'
+        self.reference = []
+
+
+def readTouchstone(fileAddress: str):
+
+    options = touchstoneOptions()
+    keywords = touchstoneKeywords()
+    optionsFound = False
+    section = 'network' # Version 1 files only hold network data (and 2-port noise data)
+    blocks = []
+
+    with open(fileAddress, 'r') as file:
+        while True:
+            lines = list(itertools.islice(file, blockLines))
+            if not lines:
+                break
+
+            dataLines = []
+            for line in lines:
+                line = line.split('!', 1)[0].strip()
+                if not line:
+                    continue
+
+                # Option line (only the first one counts)
+                if line[0] == '#':
+                    if not optionsFound:
+                        readOptions(line, options)
+                        optionsFound = True
+
+                # Version 2 keywords
+                elif line[0] == '[':
+                    section = readKeyword(line, keywords, section)
+
+                elif section == 'reference':
+                    keywords.reference = keywords.reference + [float(value) for value in line.split()]
+
+                elif section == 'network':
+                    dataLines.append(line)
+
+            # Parse numbers of the whole block at once
+            if dataLines:
+                blocks.append(np.array(' '.join(dataLines).split(), dtype=float))
+
+    values = np.concatenate(blocks) if blocks else np.zeros((0,))
+
+    # Determine number of ports
+    portCount = keywords.portCount
+    if portCount == 0:
+        match = re.search(r'\.s([0-9]+)p$', fileAddress.lower())
+        if match is None:
+            raise ValueError('number of ports of "{0}" is unknown, use a .sNp extension'.format(fileAddress))
+        portCount = int(match.group(1))
+
+    if options.parameter != 'S':
+        raise ValueError('"{0}" holds {1}-parameters, only S-parameters are supported'.format(fileAddress, options.parameter))
+
+    # Split values into frequency records
+    if keywords.matrixFormat == 'FULL':
+        entryCount = portCount**2
+    else:
+        entryCount = portCount*(portCount+1)//2
+    records = splitRecords(values, entryCount, portCount, keywords.version, fileAddress)
+
+    frequencies = records[:,0]*options.frequencyUnit
+    entries = toComplex(records[:,1::2], records[:,2::2], options.dataFormat)
+
+    # Arrange entries into matrices
+    sParams = arrangeMatrix(entries, portCount, keywords)
+
+    # Reference impedances
+    if keywords.reference:
+        z0 = np.array(keywords.reference[:portCount])
+    else:
+        z0 = np.ones((portCount,))*options.resistance
+
+    return frequencies, sParams, z0
+
+
+###########################################################################
+# This function reads the option line, e.g. "# GHz S MA R 50".
+###########################################################################
+def readOptions(line: str, options: touchstoneOptions):
+
+    tokens = line[1:].upper().split()
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token in frequencyUnits:
+            options.frequencyUnit = frequencyUnits[token]
+        elif token in dataFormats:
+            options.dataFormat = token
+        elif token in ['S', 'Y', 'Z', 'H', 'G']:
+            options.parameter = token
+        elif token == 'R' and index+1 < len(tokens):
+            options.resistance = float(tokens[index+1])
+            index = index + 1
+        index = index + 1
+
+
+###########################################################################
+# This function reads a version 2 keyword line and returns the section the
+# following lines belong to.
+###########################################################################
+def readKeyword(line: str, keywords: touchstoneKeywords, section: str) -> str:
+
+    keyword, _, argument = line[1:].partition(']')
+    keyword = keyword.strip().upper()
+    argument = argument.strip()
+
+    if keyword == 'VERSION':
+        keywords.version = 2
+        return 'header'
+    elif keyword == 'NUMBER OF PORTS':
+        keywords.portCount = int(argument)
+    elif keyword == 'TWO-PORT DATA ORDER':
+        keywords.twoPortOrder = argument.upper()
+    elif keyword == 'MATRIX FORMAT':
+        keywords.matrixFormat = argument.upper()
+    elif keyword == 'REFERENCE':
+        keywords.reference = [float(value) for value in argument.split()]
+        return 'reference'
+    elif keyword == 'NETWORK DATA':
+        return 'network'
+    elif keyword in ['NOISE DATA', 'END', 'BEGIN INFORMATION']:
+        return 'ignore'
+    elif keyword == 'END INFORMATION':
+        return 'header'
+
+    # Keywords without data following them end the reference list
+    return 'header' if section == 'reference' else section
+
+
+###########################################################################
+# This function splits the parsed values into one row per frequency. For
+# version 1 two-port files any noise data following the network data is
+# removed, it begins where the frequency stops increasing.
+###########################################################################
+def splitRecords(values: np.ndarray, entryCount: int, portCount: int, version: int, fileAddress: str) -> np.ndarray:
+
+    recordLength = 1 + 2*entryCount
+
+    if version == 1 and portCount == 2 and len(values) % recordLength != 0:
+        recordCount = len(values)//recordLength
+        frequencies = values[:recordCount*recordLength:recordLength]
+        decreasing = np.nonzero(np.diff(frequencies) <= 0)[0]
+        if len(decreasing) > 0:
+            values = values[:(decreasing[0]+1)*recordLength]
+
+    if len(values) % recordLength != 0:
+        raise ValueError('"{0}" does not hold a whole number of {1:d} port records'.format(fileAddress, portCount))
+
+    return values.reshape((-1, recordLength))
+
+
+###########################################################################
+# This function converts pairs of values into complex numbers.
+###########################################################################
+def toComplex(first: np.ndarray, second: np.ndarray, dataFormat: str) -> np.ndarray:
+
+    if dataFormat == 'RI':
+        return first + 1j*second
+    elif dataFormat == 'MA':
+        return first*np.exp(1j*np.deg2rad(second))
+    else:
+        return 10**(first/20)*np.exp(1j*np.deg2rad(second))
+
+
+###########################################################################
+# This function places the entries of each frequency into a matrix. Two
+# port data is column ordered unless stated otherwise, all others are row
+# ordered. Lower/upper triangular matrices are mirrored to be complete.
+###########################################################################
+def arrangeMatrix(entries: np.ndarray, portCount: int, keywords: touchstoneKeywords) -> np.ndarray:
+
+    freqPoints = entries.shape[0]
+
+    if keywords.matrixFormat == 'FULL':
+        sParams = entries.reshape((freqPoints, portCount, portCount))
+        if portCount == 2 and keywords.twoPortOrder == '21_12':
+            sParams = np.transpose(sParams, (0, 2, 1))
+    else:
+        if keywords.matrixFormat == 'LOWER':
+            rows, columns = np.tril_indices(portCount)
+        else:
+            rows, columns = np.triu_indices(portCount)
+        sParams = np.zeros((freqPoints, portCount, portCount), dtype=complex)
+        sParams[:, rows, columns] = entries
+        sParams[:, columns, rows] = entries
+
+    return np.ascontiguousarray(sParams)
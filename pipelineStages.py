@@ -0,0 +1,122 @@
+###########################################################################
+#
+#   StatOpt Simulator
+#   by Jeremy Cosson-Martin, Jhoan Salinas of
+#   Ali Sheikholeslami's group
+#   Ported to Python 3 by Savo Bajic
+#   Department of Electrical and Computer Engineering
+#   University of Toronto
+#   Copyright Material
+#   For personal use only
+#
+###########################################################################
+# These functions run the stages of the simulation that depend on the
+# variable settings, re-running only those whose results are out of date.
+# Each stage lists the settings it reads and the stages whose results it
+# uses. A stage is run again when any of its settings changed since it last
+# ran, or when one of the stages it uses was run again. For example,
+# changing a DFE tap runs the pulse response, ISI, PDF and BER again but
+# not the CTLE or noise.
+#
+# Settings are compared by their pickled values, taken right after the
+# stage ran, since some stages change their own settings (the TX main tap
+# and automatically calculated RX gain and FFE main tap).
+#
+# Inputs:
+#   simSettings: structure containing simulation settings
+#   simResults: structure containing simulation results
+#
+###########################################################################
+
+from userSettingsObjects import simulationSettings, nothing
+from initializeSimulation import simulationStatus
+from generateVariableInfluence import generateCTLE, generateNoiseInfluence
+from generatePulseResponse import generatePulseResponse
+from generateISI import generateISI
+from generatePDF import generatePDF
+from generateBER import generateBER
+import functools
+import pickle
+
+class pipelineStage:
+    def __init__(self, name, function, settings, parents):
+        self.name = name         # name the stage's state is kept under
+        self.function = function # function run by the stage
+        self.settings = settings # paths of the settings read by the stage
+        self.parents = parents   # names of the stages whose results are used
+
+# Stages in the order they are run
+stages = [
+    pipelineStage('CTLE', generateCTLE,
+                  ['receiver.CTLE'],
+                  []),
+    pipelineStage('noise', generateNoiseInfluence,
+                  ['general.yAxis', 'general.yAxisLength', 'general.yIncrement',
+                   'transmitter.TXBandwidth', 'transmitter.noise', 'channel.noise', 'receiver.noise',
+                   'receiver.signalAmplitude', 'receiver.preAmp', 'receiver.CTLE', 'receiver.FFE'],
+                  ['CTLE']),
+    pipelineStage('pulse', generatePulseResponse,
+                  ['general.samplesPerSymb', 'general.samplePeriod', 'general.signalingMode', 'general.pulseEngine', 'general.plotting',
+                   'transmitter.signalAmplitude', 'transmitter.preCursorCount', 'transmitter.postCursorCount',
+                   'transmitter.includeSourceImpedance', 'transmitter.EQ', 'channel.approximate',
+                   'receiver.signalAmplitude', 'receiver.preAmp', 'receiver.CTLE', 'receiver.FFE', 'receiver.DFE',
+                   'adaption.adapt', 'adaption.knobs'],
+                  ['CTLE']),
+    pipelineStage('ISI', generateISI,
+                  ['general.signalingMode', 'general.ISIMode', 'general.ISIBlockSize', 'general.foldISI',
+                   'general.samplesPerSymb', 'general.modulation', 'general.levelNumb',
+                   'general.yAxis', 'general.yIncrement',
+                   'transmitter.preCursorCount', 'transmitter.postCursorCount', 'transmitter.cursorCount',
+                   'channel.approximate', 'adaption.speedUpSim'],
+                  ['pulse']),
+    pipelineStage('PDF', generatePDF,
+                  ['general.samplesPerSymb', 'general.xAxisCenter', 'general.yAxis', 'general.yAxisLength', 'general.yIncrement',
+                   'channel.addCrossTalk', 'channel.approximate', 'channel.makeAsynchronous', 'channel.noise.addNoise',
+                   'transmitter.distortion', 'transmitter.jitter', 'transmitter.noise.addNoise',
+                   'receiver.distortion', 'receiver.jitter', 'receiver.noise.addNoise'],
+                  ['noise', 'ISI']),
+    pipelineStage('BER', generateBER,
+                  ['general.levelNumb', 'general.samplerNumb', 'general.samplesPerSymb', 'general.signalingMode', 'general.yAxisLength'],
+                  ['PDF']),
+]
+
+
+###########################################################################
+# This function runs every stage that is out of date, in order. Stages
+# that are skipped restore the success flag they left, so a failure found
+# by an earlier run still stops the stages after it.
+###########################################################################
+def runStages(simSettings: simulationSettings, simResults: simulationStatus):
+
+    # Needed for output
+    if 'stages' not in simResults.__dict__:
+        setattr(simResults, 'stages', nothing())
+        simResults.stages.fingerprints = {}
+        simResults.stages.successful = {}
+    fingerprints = simResults.stages.fingerprints
+    successful = simResults.stages.successful
+
+    rerun = set()
+    for stage in stages:
+
+        # Determine if stage is out of date
+        outdated = any(parent in rerun for parent in stage.parents)
+        outdated = outdated or fingerprints.get(stage.name) != settingsFingerprint(simSettings, stage.settings)
+
+        if outdated:
+            stage.function(simSettings, simResults)
+            fingerprints[stage.name] = settingsFingerprint(simSettings, stage.settings)
+            successful[stage.name] = simResults.results.successful
+            rerun.add(stage.name)
+        else:
+            simResults.results.successful = simResults.results.successful and successful[stage.name]
+
+
+###########################################################################
+# This function returns the pickled values of the given settings.
+###########################################################################
+def settingsFingerprint(simSettings: simulationSettings, settingPaths: list) -> bytes:
+
+    values = [functools.reduce(getattr, settingPath.split('.'), simSettings) for settingPath in settingPaths]
+
+    return pickle.dumps(values)
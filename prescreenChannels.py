@@ -0,0 +1,49 @@
+###########################################################################
+#
+#   StatOpt Simulator
+#   by Jeremy Cosson-Martin, Jhoan Salinas of
+#   Ali Sheikholeslami's group
+#   Ported to Python 3 by Savo Bajic
+#   Department of Electrical and Computer Engineering
+#   University of Toronto
+#   Copyright Material
+#   For personal use only
+#
+###########################################################################
+# This file ranks all Touchstone channels in the channels folder without
+# running a simulation, to help choose which ones are worth simulating. The
+# symbol rate, transmitter amplitude and rise time, port map and caching
+# option are taken from the selected simulation settings file. Channels are
+# ranked by the ratio of their signal at the Nyquist frequency to the
+# integrated crosstalk noise of their NEXT/FEXT aggressors.
+#
+# To select which settings to use, edit where the generateUserSettings
+# function is imported from a few lines below.
+#
+###########################################################################
+
+from generateUserSettingsExample0 import generateUserSettings # Change the 'from' file to desired file
+
+import time # Used for monitoring execution time
+from indexChannelFiles import updateChannelIndex, rankChannels
+
+startTime = time.time()
+
+simSettings = generateUserSettings()
+symbolRate = simSettings.general.symbolRate.value
+amplitude  = simSettings.transmitter.signalAmplitude.value
+tRise      = simSettings.transmitter.tRise.value
+portMap    = simSettings.channel.portMap
+useCache   = simSettings.channel.cacheChannels
+
+# Index channel files (only reads new or changed files)
+index = updateChannelIndex(symbolRate, tRise, portMap, useCache)
+rankings = rankChannels(index, symbolRate, tRise, amplitude)
+
+# Display ranking
+print('\n----------Channel Pre-Screen at {0:.2f}GBd----------'.format(symbolRate/1e9))
+print('{0:>4s}  {1:>10s}  {2:>10s}  {3:>10s}  {4:>10s}  {5:>9s}  {6:s}'.format('Rank', 'IL [dB]', 'NEXT [mV]', 'FEXT [mV]', 'ICN [mV]', 'SCR [dB]', 'Channel'))
+for rank, ranking in enumerate(rankings):
+    print('{0:4d}  {1:10.2f}  {2:10.3f}  {3:10.3f}  {4:10.3f}  {5:9.2f}  {6:s}'.format(rank+1, ranking.insertionLoss, ranking.nextNoise*1e3, ranking.fextNoise*1e3, ranking.noise*1e3, ranking.ratio, ranking.thru))
+
+print('\n{0:d} channel files ranked in {1:.3f} seconds'.format(len(index['files']), time.time() - startTime))
@@ -0,0 +1,44 @@
+###########################################################################
+#
+#   StatOpt Simulator
+#   by Jeremy Cosson-Martin, Jhoan Salinas of
+#   Ali Sheikholeslami's group
+#   Ported to Python 3 by Savo Bajic
+#   Department of Electrical and Computer Engineering
+#   University of Toronto
+#   Copyright Material
+#   For personal use only
+#
+###########################################################################
+# This function applies a function to every item of a list, concurrently
+# if more than one worker is allowed. Results are returned in the order of
+# the items so they do not depend on the number of workers.
+#
+# Threads suit work done mostly by NumPy and SciPy, which run without
+# holding the interpreter lock and can share arrays without copying them.
+# Processes suit work done mostly in Python, at the cost of sending the
+# items and results between processes. Forked processes are used since
+# spawned ones would re-run the calling script, where forking is
+# unavailable threads are used instead.
+#
+###########################################################################
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+def mapConcurrently(function, items: list, workers: int = 1, useProcesses: bool = False) -> list:
+
+    # Run serially if there is nothing to gain
+    if workers <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+
+    workers = min(workers, len(items))
+    if useProcesses and 'fork' in multiprocessing.get_all_start_methods():
+        executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+    else:
+        executor = ThreadPoolExecutor(workers)
+
+    with executor:
+        results = list(executor.map(function, items))
+
+    return results
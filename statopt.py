@@ -37,11 +37,7 @@ from initializeSimulation import initializeSimulation
 from checkSettings import checkSettings
 from adaption import displayAdaption, adaptLink
 from generateFixedInfluence import generateFixedInfluence
-from generateVariableInfluence import generateVariableInfluence
-from generatePulseResponse import generatePulseResponse
-from generateISI import generateISI
-from generatePDF import generatePDF
-from generateBER import generateBER
+from pipelineStages import runStages
 from generateResults import generateResults
 from displayResults import displayResults
 from displayResponses import displayChannels, displayCTLEResponse, displayPulse
@@ -67,20 +63,10 @@ doneFixedTime = time.time() # Mark time once fixed influences are prepared
 # Analyze and Adapt Link
 while not simResults.finished:
     
-    # Generate variable sources of influence
-    generateVariableInfluence(simSettings, simResults)
-
-    # Generate pulse response
-    generatePulseResponse(simSettings, simResults)
-
-    # Generate ISI signal trajectories
-    generateISI(simSettings, simResults)
-
-    # Generate probability distribution
-    generatePDF(simSettings, simResults)
-
-    # Generate BER distribution
-    generateBER(simSettings, simResults)
+    # Generate variable sources of influence, pulse response, ISI signal
+    # trajectories, probability distribution and BER distribution (only
+    # the stages affected by changed settings are run again)
+    runStages(simSettings, simResults)
 
     # Generate simulation results
     generateResults(simSettings, simResults)
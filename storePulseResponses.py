@@ -0,0 +1,130 @@
+###########################################################################
+#
+#   StatOpt Simulator
+#   by Jeremy Cosson-Martin, Jhoan Salinas of
+#   Ali Sheikholeslami's group
+#   Ported to Python 3 by Savo Bajic
+#   Department of Electrical and Computer Engineering
+#   University of Toronto
+#   Copyright Material
+#   For personal use only
+#
+###########################################################################
+# These functions keep the final pulse responses of a simulation next to
+# the parsed channels, so later runs with the same channels and
+# equalization load them instead of generating them again. Entries are
+# keyed by a hash of the pulse responses of the channels, the transmitter
+# output (symbol rate, amplitude, cursors and TX equalization) and every
+# receiver setting used to generate the pulses. Settings that only affect
+# later stages, such as noise, jitter and plotting, are not part of the key.
+#
+# The store is not used while adapting, since the RX gain and FFE main tap
+# may then be calculated from the pulse and every candidate would add an
+# entry.
+#
+###########################################################################
+
+from userSettingsObjects import simulationSettings, nothing
+from initializeSimulation import simulationStatus
+from loadChannelFiles import cacheFolder
+import numpy as np
+import hashlib
+import pickle
+import os
+
+###########################################################################
+# This function returns the address of the stored pulse responses for the
+# current settings, or None if the store is not used.
+###########################################################################
+def pulseStoreAddress(simSettings: simulationSettings, simResults: simulationStatus):
+
+    # Import variables
+    cachePulses     = simSettings.channel.cachePulses
+    adapt           = simSettings.adaption.adapt
+    approximate     = simSettings.channel.approximate
+    channels        = simResults.influenceSources.channel
+    TXOutput        = simResults.pulseResponse.transmitter.output
+
+    if not cachePulses or adapt:
+        return None
+
+    # Skip required channels
+    if approximate:
+        chNames = [chName for chName in channels.__dict__ if chName in ['thru', 'xtalk']]
+    else:
+        chNames = [chName for chName in channels.__dict__ if chName not in ['next', 'fext', 'xtalk']]
+
+    pulseHash = hashlib.sha256()
+    for chName in chNames:
+        pulseHash.update(chName.encode())
+        pulseHash.update(np.ascontiguousarray(channels.__dict__[chName].pulseResponse, dtype=float).tobytes())
+    pulseHash.update(np.ascontiguousarray(TXOutput, dtype=float).tobytes())
+
+    settings = [simSettings.general.samplesPerSymb, simSettings.general.samplePeriod, simSettings.general.signalingMode,
+                simSettings.general.pulseEngine, simSettings.transmitter.preCursorCount, simSettings.transmitter.postCursorCount,
+                simSettings.receiver.signalAmplitude, simSettings.receiver.preAmp, simSettings.receiver.CTLE,
+                simSettings.receiver.FFE, simSettings.receiver.DFE]
+    pulseHash.update(pickle.dumps(settings, protocol=4))
+
+    return os.path.join(cacheFolder, 'pulse_{0:s}.npz'.format(pulseHash.hexdigest()))
+
+
+###########################################################################
+# This function loads the stored pulse responses, if available. The
+# channel output of the thru channel is also loaded when it is plotted.
+# Returns whether the pulse responses were loaded.
+###########################################################################
+def loadPulseResponses(simSettings: simulationSettings, simResults: simulationStatus, storeAddress: str) -> bool:
+
+    # Import variables
+    plotPulse = simSettings.general.plotting.pulseResponse
+
+    if storeAddress is None or not os.path.isfile(storeAddress):
+        return False
+
+    try:
+        with np.load(storeAddress, allow_pickle=False) as stored:
+            if plotPulse and 'channel_thru' not in stored.files:
+                return False # Entry does not cover plotting, it is generated again and replaced
+
+            outputs = nothing()
+            channelOutputs = nothing()
+            for key in stored.files:
+                if key.startswith('receiver_'):
+                    outputs.__dict__[key[len('receiver_'):]] = stored[key]
+                elif key == 'channel_thru':
+                    channelOutputs.thru = stored[key]
+    except (OSError, KeyError, ValueError):
+        return False # Unreadable entries are generated again and replaced
+
+    # Save results
+    setattr(simResults.pulseResponse, 'channel', nothing())
+    simResults.pulseResponse.channel.input = simResults.pulseResponse.transmitter.output
+    simResults.pulseResponse.channel.outputs = channelOutputs
+    simResults.pulseResponse.receiver.outputs = outputs
+
+    return True
+
+
+###########################################################################
+# This function stores the final pulse responses, along with the channel
+# output of the thru channel if it was generated.
+###########################################################################
+def savePulseResponses(simResults: simulationStatus, storeAddress: str):
+
+    # Import variables
+    pulses = simResults.pulseResponse.receiver.outputs
+    channelOutputs = simResults.pulseResponse.channel.outputs
+
+    if storeAddress is None:
+        return
+
+    arrays = {'receiver_'+chName: pulses.__dict__[chName] for chName in pulses.__dict__ if isinstance(pulses.__dict__[chName], np.ndarray)}
+    if 'thru' in channelOutputs.__dict__:
+        arrays['channel_thru'] = channelOutputs.thru
+
+    os.makedirs(cacheFolder, exist_ok=True)
+    tempAddress = '{0}.{1:d}.tmp'.format(storeAddress, os.getpid())
+    with open(tempAddress, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(tempAddress, storeAddress)
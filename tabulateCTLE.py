@@ -0,0 +1,128 @@
+###########################################################################
+#
+#   StatOpt Simulator
+#   by Jeremy Cosson-Martin, Jhoan Salinas of
+#   Ali Sheikholeslami's group
+#   Ported to Python 3 by Savo Bajic
+#   Department of Electrical and Computer Engineering
+#   University of Toronto
+#   Copyright Material
+#   For personal use only
+#
+###########################################################################
+# These functions tabulate the CTLE response over the lattice of knob
+# settings allowed by the settings limits, on the channel frequencies. The
+# CTLE is made of real zeros and poles with unity gain at DC, so:
+#
+#   H(f) = (1 + jf/fz)^nz / ((1 + jf/fp1)^np1 * (1 + jf/fp2)^np2)
+#
+# Its log-magnitude and phase are sums of those of single first-order
+# sections. Only one section per lattice frequency is tabulated, so the
+# table stays small while any combination of frequencies and counts is
+# found from three rows of it. The table is saved next to the parsed
+# channels and memory-mapped when used.
+#
+###########################################################################
+
+import numpy as np
+import hashlib
+import os
+from loadChannelFiles import cacheFolder
+
+class CTLETable:
+    def __init__(self, lattice, frequencies, sections):
+        self.lattice = lattice         # section corner frequencies [Hz]
+        self.frequencies = frequencies # [Hz]
+        self.sections = sections       # log-magnitude and phase [rad] of each section, indexed as [0/1, corner, frequency]
+
+
+###########################################################################
+# This function returns the corner frequencies a CTLE zero or pole can be
+# set to, given the limits of the frequency knobs.
+###########################################################################
+def CTLELattice(knobs: list) -> np.ndarray:
+
+    lattice = []
+    for knob in knobs:
+        if np.isnan(knob.minValue) or np.isnan(knob.maxValue) or np.isnan(knob.increment):
+            continue
+        steps = int(round((knob.maxValue-knob.minValue)/knob.increment))
+        lattice.append(knob.minValue + knob.increment*np.arange(steps+1))
+
+    if not lattice:
+        return np.zeros((0,))
+
+    return np.unique(np.round(np.concatenate(lattice)))
+
+
+###########################################################################
+# This function returns the table for the given lattice and frequencies,
+# either from the cache or by calculating it (updating the cache after).
+###########################################################################
+def loadCTLETable(lattice: np.ndarray, freqs: np.ndarray, useCache: bool = True) -> CTLETable:
+
+    tableHash = hashlib.sha256()
+    tableHash.update(np.ascontiguousarray(lattice, dtype=float).tobytes())
+    tableHash.update(np.ascontiguousarray(freqs, dtype=float).tobytes())
+    cacheAddress = os.path.join(cacheFolder, 'ctle_{0:s}.npy'.format(tableHash.hexdigest()))
+
+    # Use cached table if available
+    if useCache and os.path.isfile(cacheAddress):
+        try:
+            sections = np.load(cacheAddress, mmap_mode='r')
+            if sections.shape == (2, len(lattice), len(freqs)):
+                return CTLETable(lattice, freqs, sections)
+        except (OSError, ValueError):
+            pass # Unreadable tables are calculated again and overwritten
+
+    # Evaluate all sections at once
+    sections = sectionResponses(lattice, freqs)
+
+    # Update cache
+    if useCache:
+        os.makedirs(cacheFolder, exist_ok=True)
+        tempAddress = '{0}.{1:d}.tmp'.format(cacheAddress, os.getpid())
+        with open(tempAddress, 'wb') as file:
+            np.save(file, sections)
+        os.replace(tempAddress, cacheAddress)
+        sections = np.load(cacheAddress, mmap_mode='r')
+
+    return CTLETable(lattice, freqs, sections)
+
+
+###########################################################################
+# This function finds the magnitude and phase [rad] of a CTLE from the
+# table. Corner frequencies off the lattice are evaluated directly.
+###########################################################################
+def lookupCTLE(table: CTLETable, zeroFreq: float, zeroNumb: int, pole1Freq: float, pole1Numb: int, pole2Freq: float, pole2Numb: int):
+
+    logMagnitude = np.zeros((len(table.frequencies),))
+    phase = np.zeros((len(table.frequencies),))
+
+    for cornerFreq, power in [(zeroFreq, zeroNumb), (pole1Freq, -pole1Numb), (pole2Freq, -pole2Numb)]:
+        if power == 0:
+            continue
+
+        index = np.searchsorted(table.lattice, cornerFreq)
+        if index < len(table.lattice) and np.isclose(table.lattice[index], cornerFreq, rtol=1e-9, atol=0):
+            section = table.sections[:, index, :]
+        else:
+            section = sectionResponses(np.array([cornerFreq]), table.frequencies)[:, 0, :]
+
+        logMagnitude = logMagnitude + power*section[0]
+        phase = phase + power*section[1]
+
+    return np.exp(logMagnitude), phase
+
+
+###########################################################################
+# This function evaluates the log-magnitude and phase of first-order zero
+# sections, (1 + jf/fc), for every corner frequency.
+###########################################################################
+def sectionResponses(cornerFreqs: np.ndarray, freqs: np.ndarray) -> np.ndarray:
+
+    ratio = freqs[np.newaxis, :] / cornerFreqs[:, np.newaxis]
+    logMagnitude = 0.5*np.log1p(ratio**2)
+    phase = np.arctan(ratio)
+
+    return np.stack((logMagnitude, phase))
@@ -87,6 +87,17 @@ class generalSettings:
     # Target BER
     targetBER: valueWithLimits = valueWithLimits() # used for measurement purposes
 
+    # Parallel processing
+    workerCount: valueWithLimits = valueWithLimits(1) # number of parallel workers (1: run serially)
+
+    # Pulse response engine ('time','frequency','superposition')
+    pulseEngine: str = 'time'
+
+    # ISI generation mode ('enumerate': every cursor combination, 'stream': every cursor combination in blocks, 'convolve': statistically by convolving cursor distributions)
+    ISIMode: str = 'enumerate'
+    ISIBlockSize: valueWithLimits = valueWithLimits(65536) # number of cursor combinations enumerated at once when streaming
+    foldISI: bool = True # enumerate only one of each pair of mirrored transitions and reflect it for the other (when enumerating or streaming)
+
     plotting: plottingSettings = plottingSettings()
 
 @dataclass
@@ -225,9 +236,34 @@ class channelSettings:
     # Make cross-talk channels asynchronous
     makeAsynchronous: bool = True
 
-    # Channel file names (ensure channel data has same frequency points)
+    # Channel file names (files measured at different frequency points are resampled onto a common grid)
     fileNames: fileNamesHolder = fileNamesHolder()
 
+    # Touchstone port pairs ([positive, negative]) of the channel input and output
+    portMap: list = field(default_factory=lambda : [[1, 3], [2, 4]])
+
+    # Cache parsed Touchstone files to speed up subsequent runs
+    cacheChannels: bool = True
+
+    # Keep final pulse responses on disk so later runs with the same channels and equalization skip generating them (not while adapting)
+    cachePulses: bool = True
+
+    # Band-limit channel data before creating pulse responses (speeds up simulation, reduces accuracy)
+    decimate: bool = False
+    decimationSpan: valueWithLimits = valueWithLimits(200)    # time window kept around the impulse peak [UI]
+    decimationBandLimit: valueWithLimits = valueWithLimits(2) # highest frequency kept [symbol rate]
+
+    # Truncate impulse responses around their peak ('none', 'energy', 'span')
+    truncationMode: str = 'none'
+    truncationEnergy: valueWithLimits = valueWithLimits(0.99999) # fraction of impulse energy kept ('energy' mode)
+    truncationSpan: valueWithLimits = valueWithLimits(100)       # span kept around the impulse peak [UI] ('span' mode)
+
+    # Fit channels with rational models and create pulse responses from them by recursive filtering
+    rationalModel: bool = False
+    rationalPoleCount: valueWithLimits = valueWithLimits(60)   # number of poles
+    rationalSpan: valueWithLimits = valueWithLimits(200)       # length of pulse responses after the pulse [UI]
+    rationalTolerance: valueWithLimits = valueWithLimits(0.01) # largest relative RMS fit error of a model that is used
+
 
 # The complete compiled class for all simulation settings
 @dataclass
@@ -0,0 +1,269 @@
+###########################################################################
+#
+#   StatOpt Simulator
+#   by Jeremy Cosson-Martin, Jhoan Salinas of
+#   Ali Sheikholeslami's group
+#   Ported to Python 3 by Savo Bajic
+#   Department of Electrical and Computer Engineering
+#   University of Toronto
+#   Copyright Material
+#   For personal use only
+#
+###########################################################################
+# These functions fit sampled channel transfer functions with compact
+# rational (pole-residue) models using vector fitting (B. Gustavsen and
+# A. Semlyen, "Rational approximation of frequency domain responses by
+# vector fitting", IEEE Trans. Power Delivery, 1999). The bulk delay of
+# the channel is removed before fitting and kept separately, so:
+#
+#   H(s) = sum(r_k / (s - p_k)) * exp(-s*delay)
+#
+# Channels roll off at high frequencies so the model is strictly proper,
+# which also keeps it from amplifying content above the measured band.
+#
+# Once fitted, a model is turned into a pulse response at any sample rate
+# by recursive (IIR) filtering, one first-order section per pole, without
+# the large inverse FFT needed for the sampled response. Fitted models are
+# cached next to the parsed channels, keyed by the fitted response and the
+# number of poles, so changing the symbol rate or samples per symbol does
+# not require fitting again.
+#
+###########################################################################
+
+import numpy as np
+import scipy.signal as signal
+import hashlib
+import os
+from loadChannelFiles import cacheFolder
+
+outOfBandPoints = 200 # Frequencies above the measured band where no response is asked for
+
+class rationalModel:
+    def __init__(self, poles, residues, delay, fitError):
+        self.poles = poles       # [rad/s]
+        self.residues = residues # [rad/s]
+        self.delay = delay       # removed bulk delay [s]
+        self.fitError = fitError # RMS error relative to the peak response magnitude
+
+
+###########################################################################
+# This function fits a transfer function with the given (even) number of
+# poles, starting from complex pole pairs spread over the frequency range.
+###########################################################################
+def vectorFit(freqs: np.ndarray, tranFunc: np.ndarray, poleCount: int, iterations: int = 10) -> rationalModel:
+
+    # Remove bulk delay so the remainder is smooth enough to fit
+    delay = estimateDelay(freqs, tranFunc)
+    response = tranFunc * np.exp(2j*np.pi*freqs*delay)
+
+    # Normalize frequencies to improve conditioning
+    scale = 2*np.pi*freqs[-1]
+    s = 2j*np.pi*freqs / scale
+
+    # Starting poles
+    imagParts = np.linspace(freqs[-1]/poleCount, freqs[-1], poleCount//2) * 2*np.pi / scale
+    poles = np.concatenate([[-imag/100 + 1j*imag, -imag/100 - 1j*imag] for imag in imagParts])
+
+    # Relocate poles
+    for _ in range(iterations):
+        poles = relocatePoles(s, response, poles)
+
+    # Identify residues with final poles, asking for no response above the
+    # measured band so fast poles do not pass sharp signal edges through
+    outOfBand = 1j*np.geomspace(1.05, 20, outOfBandPoints)
+    system = np.vstack((poleBasis(s, poles), poleBasis(outOfBand, poles) * np.sqrt(len(s)/outOfBandPoints)))
+    coefficients = solveReal(system, np.concatenate((response, np.zeros((outOfBandPoints,)))))
+    residues = basisToResidues(poles, coefficients)
+
+    fitted = np.sum(residues / (s[:, np.newaxis] - poles), axis=1)
+    fitError = np.sqrt(np.mean(np.abs(fitted - response)**2)) / np.max(np.abs(response))
+
+    return rationalModel(poles*scale, residues*scale, delay, fitError)
+
+
+###########################################################################
+# This function returns the model of a transfer function, either from the
+# cache or by fitting it (updating the cache afterwards).
+###########################################################################
+def fitChannelModel(freqs: np.ndarray, tranFunc: np.ndarray, poleCount: int, useCache: bool = True) -> rationalModel:
+
+    responseHash = hashlib.sha256()
+    responseHash.update(np.ascontiguousarray(freqs, dtype=float).tobytes())
+    responseHash.update(np.ascontiguousarray(tranFunc, dtype=complex).tobytes())
+    cacheAddress = os.path.join(cacheFolder, 'model_{0:s}_{1:d}.npz'.format(responseHash.hexdigest(), poleCount))
+
+    # Use cached model if available
+    if useCache and os.path.isfile(cacheAddress):
+        try:
+            with np.load(cacheAddress, allow_pickle=False) as cached:
+                return rationalModel(cached['poles'], cached['residues'], float(cached['delay']), float(cached['fitError']))
+        except (OSError, KeyError, ValueError):
+            pass # Unreadable entries are fitted again and overwritten
+
+    model = vectorFit(freqs, tranFunc, poleCount)
+
+    # Update cache
+    if useCache:
+        os.makedirs(cacheFolder, exist_ok=True)
+        tempAddress = '{0}.{1:d}.tmp'.format(cacheAddress, os.getpid())
+        with open(tempAddress, 'wb') as file:
+            np.savez(file, poles=model.poles, residues=model.residues, delay=model.delay, fitError=model.fitError)
+        os.replace(tempAddress, cacheAddress)
+
+    return model
+
+
+###########################################################################
+# This function evaluates a model at the given frequencies.
+###########################################################################
+def evaluateModel(model: rationalModel, freqs: np.ndarray) -> np.ndarray:
+
+    s = 2j*np.pi*freqs
+    response = np.sum(model.residues / (s[:, np.newaxis] - model.poles), axis=1)
+
+    return response * np.exp(-s*model.delay)
+
+
+###########################################################################
+# This function passes a signal through a model by recursive filtering.
+# Each pole is discretized by impulse invariance, with its gain adjusted to
+# keep the DC gain of its continuous time section. The bulk delay is not
+# applied.
+###########################################################################
+def filterWithModel(model: rationalModel, inputSignal: np.ndarray, samplePeriod: float) -> np.ndarray:
+
+    outputSignal = np.zeros((len(inputSignal),))
+
+    # Complex conjugate poles give conjugate outputs, only one of each pair is needed
+    for pole, residue in zip(model.poles, model.residues):
+        if pole.imag < 0:
+            continue
+        feedback = np.exp(pole*samplePeriod)
+        gain = -residue / pole * (1 - feedback)
+        section = signal.lfilter([gain], [1, -feedback], inputSignal.astype(complex))
+        outputSignal = outputSignal + (2*section.real if pole.imag > 0 else section.real)
+
+    return outputSignal
+
+
+###########################################################################
+# This function estimates the bulk delay of a transfer function as the
+# onset of its impulse response, where it last rises above a small fraction
+# of its peak before reaching it. Removing this delay leaves a response
+# that is still causal.
+###########################################################################
+def estimateDelay(freqs: np.ndarray, tranFunc: np.ndarray, threshold: float = 0.01) -> float:
+
+    impulseResponse = np.fft.irfft(tranFunc)
+    timeStep = 1 / (len(impulseResponse) * (freqs[1] - freqs[0]))
+
+    peakIndex = np.argmax(np.abs(impulseResponse))
+    quiet = np.nonzero(np.abs(impulseResponse[:peakIndex+1]) < threshold*np.abs(impulseResponse[peakIndex]))[0]
+    onsetIndex = quiet[-1] if len(quiet) > 0 else 0
+
+    return onsetIndex * timeStep
+
+
+###########################################################################
+# This function performs one relaxed pole relocation step (B. Gustavsen,
+# "Improving the pole relocating properties of vector fitting", 2006). The
+# response is matched by sigma(s)*H(s) = p(s), where sigma(s) has a free
+# constant term fixed only by the mean of its real part. The zeros of
+# sigma(s) become the new poles.
+###########################################################################
+def relocatePoles(s: np.ndarray, response: np.ndarray, poles: np.ndarray) -> np.ndarray:
+
+    basis = poleBasis(s, poles)
+    poleNumb = len(poles)
+
+    # Fit equations followed by the relaxation constraint
+    system = np.hstack((basis, -response[:, np.newaxis]*basis, -response[:, np.newaxis]))
+    constraint = np.concatenate((np.zeros((poleNumb,)), np.sum(basis.real, axis=0), [len(s)]))
+    weight = np.linalg.norm(response) / len(s)
+    coefficients = solveReal(np.vstack((system, weight*constraint)), np.concatenate((np.zeros((len(s),)), [weight*len(s)])))
+
+    sigmaCoefficients = coefficients[poleNumb:2*poleNumb]
+    sigmaConstant = coefficients[-1]
+    if abs(sigmaConstant) < 1e-8:
+        sigmaConstant = 1e-8 * np.sign(sigmaConstant) if sigmaConstant != 0 else 1e-8
+    sigmaCoefficients = sigmaCoefficients / sigmaConstant
+
+    # Zeros of sigma from state space realization
+    stateMatrix = np.zeros((poleNumb, poleNumb))
+    inputVector = np.zeros((poleNumb,))
+    index = 0
+    while index < poleNumb:
+        pole = poles[index]
+        if pole.imag == 0:
+            stateMatrix[index, index] = pole.real
+            inputVector[index] = 1
+            index = index + 1
+        else:
+            stateMatrix[index:index+2, index:index+2] = [[pole.real, pole.imag], [-pole.imag, pole.real]]
+            inputVector[index:index+2] = [2, 0]
+            index = index + 2
+
+    newPoles = np.linalg.eigvals(stateMatrix - np.outer(inputVector, sigmaCoefficients))
+
+    # Flip unstable poles and order them in conjugate pairs
+    newPoles = -np.abs(newPoles.real) + 1j*newPoles.imag
+    realPoles = newPoles[np.abs(newPoles.imag) <= 1e-12*np.abs(newPoles)].real
+    complexPoles = newPoles[newPoles.imag > 1e-12*np.abs(newPoles)]
+
+    return np.concatenate((realPoles.astype(complex), np.ravel(np.column_stack((complexPoles, np.conj(complexPoles))))))
+
+
+###########################################################################
+# This function creates the real valued basis functions of the poles.
+# Complex conjugate pairs give the sum and difference of their fractions.
+###########################################################################
+def poleBasis(s: np.ndarray, poles: np.ndarray) -> np.ndarray:
+
+    basis = np.zeros((len(s), len(poles)), dtype=complex)
+    index = 0
+    while index < len(poles):
+        pole = poles[index]
+        if pole.imag == 0:
+            basis[:, index] = 1 / (s - pole)
+            index = index + 1
+        else:
+            basis[:, index] = 1 / (s - pole) + 1 / (s - np.conj(pole))
+            basis[:, index+1] = 1j / (s - pole) - 1j / (s - np.conj(pole))
+            index = index + 2
+
+    return basis
+
+
+###########################################################################
+# This function converts real basis coefficients back into residues.
+###########################################################################
+def basisToResidues(poles: np.ndarray, coefficients: np.ndarray) -> np.ndarray:
+
+    residues = np.zeros((len(poles),), dtype=complex)
+    index = 0
+    while index < len(poles):
+        if poles[index].imag == 0:
+            residues[index] = coefficients[index]
+            index = index + 1
+        else:
+            residues[index] = coefficients[index] + 1j*coefficients[index+1]
+            residues[index+1] = coefficients[index] - 1j*coefficients[index+1]
+            index = index + 2
+
+    return residues
+
+
+###########################################################################
+# This function solves a complex least squares problem for real unknowns.
+###########################################################################
+def solveReal(system: np.ndarray, target: np.ndarray) -> np.ndarray:
+
+    realSystem = np.vstack((system.real, system.imag))
+    realTarget = np.concatenate((target.real, target.imag))
+
+    # Normalize columns to improve conditioning
+    norms = np.linalg.norm(realSystem, axis=0)
+    norms[norms == 0] = 1
+    solution = np.linalg.lstsq(realSystem / norms, realTarget, rcond=None)[0]
+
+    return solution / norms